@@ -1,6 +1,8 @@
+from collections import deque
 from exceptions import BlockLimitException
 from random import Random
 from board import Shape
+from constants import BLOCK_LIMIT
 
 
 class Adversary:
@@ -8,13 +10,85 @@ class Adversary:
         raise NotImplementedError
 
 
+# Shapes are stored in sequences as their index in this list.
+SHAPES = list(Shape)
+
+
+def generate(random, count):
+    """
+    Draws count shapes from a Random, the same way as random.choice(list(Shape))
+    does, and returns their indices as bytes.
+    """
+
+    indices = range(len(SHAPES))
+    return bytes(random.choice(indices) for _ in range(count))
+
+
 class RandomAdversary(Adversary):
+    """
+    Chooses random blocks from a seed. The shapes are drawn up front, the
+    first blocks (or BLOCK_LIMIT if there is no limit) at once, and more as
+    needed, so they can be looked at by index or with peek before they are
+    chosen.
+    """
+
+    seed = None
     random = None
     blocks = None
+    sequence = None
+    index = None
+
+    def __init__(self, seed, blocks=None, sequence=None):
+        """
+        sequence is a precomputed sequence of shape indices (see save), or
+        any buffer of them such as a part of a corpus (see corpus.py), to
+        play instead of drawing from the seed. It must have been drawn from
+        the seed, as the blocks after it are; without a seed the game ends
+        with it.
+        """
 
-    def __init__(self, seed, blocks=None):
-        self.random = Random(seed)
+        self.seed = seed
+        if sequence is None:
+            self.random = Random(seed)
+            count = BLOCK_LIMIT if blocks is None else blocks
+            sequence = bytearray(generate(self.random, count))
+        self.sequence = sequence
         self.blocks = blocks
+        self.index = 0
+
+    @property
+    def finite(self):
+        """
+        True if the game ends with the sequence, having no seed to draw the
+        blocks after it from.
+        """
+
+        return self.random is None and self.seed is None
+
+    def __getitem__(self, index):
+        """
+        Returns the shape of the block at the given index of the game.
+        """
+
+        while index >= len(self.sequence) and not self.finite:
+            if self.random is None:
+                # Skip the shapes of the sequence to carry on after it.
+                self.random = Random(self.seed)
+                generate(self.random, len(self.sequence))
+                self.sequence = bytearray(self.sequence)
+            self.sequence += generate(self.random, BLOCK_LIMIT)
+        return SHAPES[self.sequence[index]]
+
+    def peek(self, count=1):
+        """
+        Returns the shapes of up to count blocks that are chosen next.
+        """
+
+        if self.blocks is not None:
+            count = min(count, self.blocks)
+        if self.finite:
+            count = min(count, len(self.sequence) - self.index)
+        return [self[self.index + offset] for offset in range(count)]
 
     def choose_block(self, board):
         if self.blocks is not None:
@@ -23,4 +97,59 @@ class RandomAdversary(Adversary):
             else:
                 self.blocks -= 1
 
-        return self.random.choice(list(Shape))
+        if self.finite and self.index >= len(self.sequence):
+            raise BlockLimitException()
+
+        shape = self[self.index]
+        self.index += 1
+        return shape
+
+    def save(self, path):
+        """
+        Writes the shapes drawn so far to a file, one byte per block.
+        """
+
+        with open(path, "wb") as file:
+            file.write(self.sequence)
+
+    @classmethod
+    def load(cls, path, blocks=None):
+        with open(path, "rb") as file:
+            return cls(None, blocks, sequence=file.read())
+
+
+class LookaheadAdversary(Adversary):
+    """
+    Draws the blocks of another adversary window blocks ahead of the game,
+    and passes every shape to announce as soon as it is drawn. announce is
+    given None once the other adversary has run out of blocks.
+    """
+
+    adversary = None
+    window = None
+    announce = None
+    queue = None
+    exhausted = None
+
+    def __init__(self, adversary, window, announce):
+        self.adversary = adversary
+        self.window = window
+        self.announce = announce
+        self.queue = deque()
+        self.exhausted = False
+
+    def choose_block(self, board):
+        while not self.exhausted and len(self.queue) <= self.window:
+            try:
+                shape = self.adversary.choose_block(board)
+            except BlockLimitException:
+                self.exhausted = True
+                self.announce(None)
+                break
+
+            self.announce(shape)
+            self.queue.append(shape)
+
+        if not self.queue:
+            raise BlockLimitException()
+        return self.queue.popleft()
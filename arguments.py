@@ -4,3 +4,4 @@ parser = argparse.ArgumentParser(description="Play Tetris")
 parser.add_argument(
     "--manual", "-m", default=False, action="store_true", help="Play manually"
 )
+parser.add_argument("--log", "-l", help="Log the game to a file (see gamelog.py)")
@@ -0,0 +1,91 @@
+"""
+Evaluates many resulting boards at once with NumPy. The features and the
+weight match Candidate.try_move and features.weigh exactly, so the
+batch evaluation can be used in place of the per-candidate loop.
+"""
+
+import features as board_features  # batch.features is the NumPy version.
+from board import LINE_SCORES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def available():
+    return np is not None
+
+
+def unpack(rows, width):
+    """
+    Turns a list of boards, each given as a list of row masks, into a boolean
+    array of shape (boards, height, width).
+    """
+
+    masks = np.array(rows, dtype=np.int64)
+    return (masks[:, :, None] >> np.arange(width)) & 1 == 1
+
+
+def features(grids):
+    """
+    Computes the features of every board in a (boards, height, width) array
+    of occupied cells, after removing its full lines. Returns a dict of
+    arrays with the holes, range, var_height, mean_height, bottom_holes and
+    lines of every board.
+    """
+
+    count, height, width = grids.shape
+
+    # Remove full lines by moving them to the top (keeping the order of the
+    # other lines) and emptying them.
+    full = grids.all(axis=2)
+    lines = full.sum(axis=1)
+    order = np.argsort(~full, axis=1, kind="stable")
+    grids = np.take_along_axis(grids, order[:, :, None], axis=1)
+    grids[np.arange(height)[None, :] < lines[:, None]] = False
+
+    # The y coordinate of the top of each column, or the height if empty.
+    peaks = np.where(grids.any(axis=1), grids.argmax(axis=1), height)
+    holes = (height - peaks - grids.sum(axis=1)).sum(axis=1)
+
+    return {
+        "holes": holes,
+        "range": peaks.max(axis=1) - peaks.min(axis=1),
+        "var_height": (peaks**2).sum(axis=1) * width - peaks.sum(axis=1) ** 2,
+        "mean_height": height - peaks.sum(axis=1) / width,
+        # Candidate.try_move stores the holes as the bottom holes as well.
+        "bottom_holes": holes,
+        "lines": lines,
+    }
+
+
+def line_score(lines):
+    return np.array(LINE_SCORES)[lines]
+
+
+def weigh(features, score, weights):
+    """
+    Returns the weight of every board, with features.weigh applied to the
+    arrays so that the results are identical.
+    """
+
+    return board_features.weigh(
+        weights,
+        features["holes"],
+        features["range"],
+        features["var_height"],
+        features["mean_height"],
+        features["bottom_holes"],
+        score,
+    )
+
+
+def best(weight, board_score, holes, mean_height):
+    """
+    Returns the index of the best board, breaking ties the same way
+    MyPlayer.choose_action does: lowest weight, then highest board score,
+    then fewest holes, then lowest mean height, then the first one.
+    """
+
+    return np.lexsort((mean_height, holes, -np.asarray(board_score), weight))[0]
@@ -0,0 +1,169 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+from itertools import cycle
+
+from board import Block, Board, Direction, Rotation, Shape, shape_to_color
+from constants import BOARD_HEIGHT, BOARD_WIDTH, BLOCK_LIMIT
+from placement import placements
+from player import Candidate, MyPlayer
+from trainer import load_seeds, play
+
+# Fixed mid-game boards, taken from a game of MyPlayer on DEFAULT_SEED after
+# 10, 40 and 80 blocks, so that the timings of different versions of the
+# player compare the same boards. Every board is given as its bottom rows,
+# each cell being the shape of the block it came from, and the shapes of the
+# falling and next blocks.
+SNAPSHOTS = {
+    "board10": (
+        [".T........", "TTTJ....JJ", "LLLJJJ.TJJ"],
+        Shape.I,
+        Shape.L,
+    ),
+    "board40": (
+        [".Z....Z...", "ZZ...ZZ..I", "JI.JISSIIJ"],
+        Shape.Z,
+        Shape.J,
+    ),
+    "board80": (
+        ["I.........", "I.T.JS..TT", "LZIZTTZ.JL"],
+        Shape.J,
+        Shape.S,
+    ),
+}
+
+
+def snapshot(cells, falling, next):
+    """
+    Returns a board with the given bottom rows (see SNAPSHOTS), a falling and
+    a next block.
+    """
+
+    board = Board(BOARD_WIDTH, BOARD_HEIGHT, threadsafe=False)
+    top = board.height - len(cells)
+    for y, row in enumerate(cells, top):
+        for x, cell in enumerate(row):
+            if cell != ".":
+                board.rows[y] |= 1 << x
+                board.cellcolor[(x, y)] = shape_to_color[Shape(cell)]
+    board.measure()
+
+    board.falling = Block(falling)
+    board.falling.initialize(board)
+    board.next = Block(next)
+    return board
+
+
+def measure(function, repeat=5, minimum=0.2):
+    """
+    Returns the best time per call of the function in seconds, calling it
+    often enough that every measurement takes at least minimum seconds.
+    """
+
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < minimum:
+        number *= 2
+    return min(timer.repeat(repeat, number)) / number, number
+
+
+def filled(board, lines):
+    """
+    Returns a copy of the board with the given number of bottom lines full.
+    """
+
+    board = board.clone()
+    for line in range(board.height - lines, board.height):
+        board.rows[line] = board.full
+    board.measure()
+    return board
+
+
+def bench_board(name, board):
+    results = {}
+
+    def record(case, function):
+        seconds, calls = measure(function)
+        results[f"{name}/{case}"] = {"seconds": seconds, "calls": calls}
+
+    record("Board.clone", board.clone)
+
+    # Moving left and right in turn keeps the block off the walls, so that
+    # every call is a move that succeeds.
+    block = board.falling.clone()
+    directions = cycle([Direction.Left, Direction.Right])
+    record("Block.move", lambda: block.move(next(directions), board))
+    record("Block.rotate", lambda: block.rotate(Rotation.Clockwise, board))
+
+    # Clean copies prepared outside of the timing.
+    for lines in (1, 4):
+        source = filled(board, lines)
+        copies = []
+
+        def clean():
+            copies.pop().clean()
+
+        def prepare(number):
+            copies.extend(source.clone() for _ in range(number))
+
+        timer = timeit.Timer(clean)
+        number = 1000
+        best = None
+        for _ in range(5):
+            prepare(number)
+            seconds = timer.timeit(number) / number
+            best = seconds if best is None else min(best, seconds)
+        results[f"{name}/Board.clean {lines}"] = {"seconds": best, "calls": number}
+
+    options = placements(board)
+
+    def try_move():
+        Candidate(board, placement=options[0]).try_move()
+
+    record("Candidate.try_move", try_move)
+    record("MyPlayer.choose_action", lambda: MyPlayer().choose_action(board))
+    return results
+
+
+def bench_games(seeds, blocks=BLOCK_LIMIT):
+    results = {}
+    for seed in seeds:
+        result = play(seed, MyPlayer(), blocks)
+        results[str(seed)] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the engine and player")
+    parser.add_argument("--output", "-o", help="Write the JSON results to a file")
+    parser.add_argument(
+        "--quick", "-q", action="store_true", help="Skip the full games"
+    )
+    args = parser.parse_args()
+
+    results = {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "time": time.time(),
+        "operations": {},
+        "games": {},
+    }
+    for name, (cells, falling, next) in SNAPSHOTS.items():
+        board = snapshot(cells, falling, next)
+        results["operations"].update(bench_board(name, board))
+    if not args.quick:
+        results["games"] = bench_games(load_seeds())
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
+from contextlib import nullcontext
 from enum import Enum
 from threading import Lock
+from time import perf_counter
 from exceptions import NoBlockException
 
 
@@ -110,8 +112,7 @@ class MoveFailedException(Exception):
 
 
 class Position:
-    x = None
-    y = None
+    __slots__ = ("x", "y")
 
     def __init__(self, x, y):
         self.x = x
@@ -126,6 +127,8 @@ class Bitmap:
     Base class for classes that store information about cells.
     """
 
+    __slots__ = ()
+
     cells = None
 
     def collides(self, other):
@@ -138,20 +141,100 @@ class Bitmap:
         return cell in self.cells
 
 
-class Block(Bitmap):
+class Orientation:
     """
-    Keeps track of the position of cells of a block.
+    One rotation of a shape, normalised so that its topmost and leftmost
+    cells are at offset 0.
     """
 
-    shape = None
-    color = None
+    cells = None
+    masks = None
+    width = None
+    height = None
+    profile = None
     center = None
 
+    def __init__(self, cells, center):
+        left = min(x for (x, y) in cells)
+        top = min(y for (x, y) in cells)
+
+        self.cells = tuple(sorted((x - left, y - top) for (x, y) in cells))
+        self.width = max(x for (x, y) in self.cells) + 1
+        self.height = max(y for (x, y) in self.cells) + 1
+
+        # Bitmask of every row of the orientation, relative to its left edge.
+        masks = [0] * self.height
+        for x, y in self.cells:
+            masks[y] |= 1 << x
+        self.masks = tuple(masks)
+
+        # Offset of the lowest cell in every column.
+        self.profile = tuple(
+            max(y for (x, y) in self.cells if x == column)
+            for column in range(self.width)
+        )
+
+        # Position of the rotation center relative to the top-left corner.
+        self.center = center[0] - left, center[1] - top
+
+
+def build_orientations(shape):
+    """
+    Lists the four orientations of a shape, where orientation i is the
+    result of rotating the initial cells clockwise i times.
+    """
+
+    cells = shape_to_cells[shape]
+    cx, cy = shape_to_center[shape]
+
+    orientations = []
+    for _ in range(4):
+        orientations.append(Orientation(cells, (cx, cy)))
+        cells = {(int(-(y - cy) + cx), int(x - cx + cy)) for (x, y) in cells}
+
+    return tuple(orientations)
+
+
+# Translate names of shapes to their precomputed orientations.
+shape_to_orientations = {shape: build_orientations(shape) for shape in Shape}
+
+
+class Block(Bitmap):
+    """
+    Keeps track of the position of cells of a block. The cells are given by
+    the current orientation of the shape and the position of its top-left
+    corner.
+    """
+
+    __slots__ = ("shape", "color", "center", "orientations", "rotation", "x", "y")
+
     def __init__(self, shape=None):
         self.shape = shape
         self.color = shape_to_color[shape]
-        self.cells = shape_to_cells[shape]
         self.center = shape_to_center[shape]
+        self.orientations = shape_to_orientations[shape]
+        self.rotation = 0
+        self.x = 0
+        self.y = 0
+
+    @property
+    def orientation(self):
+        return self.orientations[self.rotation]
+
+    @property
+    def cells(self):
+        x, y = self.x, self.y
+        return {(x + dx, y + dy) for (dx, dy) in self.orientation.cells}
+
+    def __iter__(self):
+        x, y = self.x, self.y
+        return ((x + dx, y + dy) for (dx, dy) in self.orientation.cells)
+
+    def __contains__(self, cell):
+        dx = cell[0] - self.x
+        dy = cell[1] - self.y
+        masks = self.orientation.masks
+        return 0 <= dx and 0 <= dy < len(masks) and bool(masks[dy] >> dx & 1)
 
     @property
     def left(self):
@@ -159,7 +242,7 @@ class Block(Bitmap):
         The leftmost x-position of the block.
         """
 
-        return min(x for (x, y) in self)
+        return self.x
 
     @property
     def right(self):
@@ -167,7 +250,7 @@ class Block(Bitmap):
         The rightmost x-position of the block.
         """
 
-        return max(x for (x, y) in self)
+        return self.x + self.orientation.width - 1
 
     @property
     def top(self):
@@ -175,7 +258,7 @@ class Block(Bitmap):
         The topmost y-position of the block.
         """
 
-        return min(y for (x, y) in self)
+        return self.y
 
     @property
     def bottom(self):
@@ -183,7 +266,7 @@ class Block(Bitmap):
         The bottommost y-position of the block.
         """
 
-        return max(y for (x, y) in self)
+        return self.y + self.orientation.height - 1
 
     def initialize(self, board):
         """
@@ -192,7 +275,7 @@ class Block(Bitmap):
 
         center = self.left + (self.right - self.left) // 2
         shift = board.width // 2 - center
-        self.cells = {(x + shift, y) for (x, y) in self}
+        self.x += shift
         self.center = self.center[0] + shift, self.center[1]
 
     def supported(self, board):
@@ -202,7 +285,21 @@ class Block(Bitmap):
         block down once more will mark it as dropped.
         """
 
-        return any((x, y + 1) in board or y + 1 == board.height for (x, y) in self)
+        # Only the lowest cell of every column can rest on something.
+        rows = board.rows
+        height = board.height
+        x, y = self.x, self.y
+        for column, bottom in enumerate(self.orientation.profile):
+            below = y + bottom + 1
+            if below == height or (below >= 0 and rows[below] >> (x + column) & 1):
+                return True
+        return False
+
+    def collides(self, other):
+        if not isinstance(other, Board):
+            return super().collides(other)
+
+        return other.overlaps(self.orientation.masks, self.x, self.y)
 
     def move(self, direction, board, count=1):
         """
@@ -210,24 +307,25 @@ class Block(Bitmap):
         true if this action caused the block to be dropped, false otherwise.
         """
 
-        old_cells = self.cells
-
         if direction == Direction.Right:
-            self.cells = {(x + count, y) for (x, y) in self}
-            if self.right >= board.width or self.collides(board):
-                # We hit something by moving; undo.
-                self.cells = old_cells
-            else:
-                self.center = self.center[0] + count, self.center[1]
+            x = self.x + count
+            masks = self.orientation.masks
+            if x + self.orientation.width > board.width or board.overlaps(
+                masks, x, self.y
+            ):
+                # We hit something by moving; do not move.
+                return False
+            self.x = x
+            self.center = self.center[0] + count, self.center[1]
             return False
 
         elif direction == Direction.Left:
-            self.cells = {(x - count, y) for (x, y) in self}
-            if self.left < 0 or self.collides(board):
-                # We hit something by moving; undo.
-                self.cells = old_cells
-            else:
-                self.center = self.center[0] - count, self.center[1]
+            x = self.x - count
+            if x < 0 or board.overlaps(self.orientation.masks, x, self.y):
+                # We hit something by moving; do not move.
+                return False
+            self.x = x
+            self.center = self.center[0] - count, self.center[1]
             return False
 
         elif direction == Direction.Down:
@@ -236,7 +334,7 @@ class Block(Bitmap):
                 # as dropped and do not move it.
                 return True
 
-            self.cells = {(x, y + count) for (x, y) in self}
+            self.y += count
             # Score a point for every row a block drops.
             board.score += count
             self.center = self.center[0], self.center[1] + count
@@ -253,16 +351,20 @@ class Block(Bitmap):
         action caused the block to be dropped, false otherwise.
         """
 
-        # Save cells so we can cancel later.
-        old_cells = self.cells
+        # Save the position so we can cancel later.
+        old_rotation = self.rotation
+        old_x, old_y = self.x, self.y
         old_center = self.center
 
         # Rotate around the center, which remains in place.
-        cx, cy = self.center
         if rotation == Rotation.Clockwise:
-            self.cells = {(int(-(y - cy) + cx), int(x - cx + cy)) for (x, y) in self}
+            self.rotation = (self.rotation + 1) % 4
         elif rotation == Rotation.Anticlockwise:
-            self.cells = {(int(y - cy + cx), int(-(x - cx) + cy)) for (x, y) in self}
+            self.rotation = (self.rotation - 1) % 4
+        cx, cy = self.center
+        ox, oy = self.orientation.center
+        self.x = int(cx - ox)
+        self.y = int(cy - oy)
 
         try:
             # If block has hit left boundary, back off.
@@ -299,47 +401,249 @@ class Block(Bitmap):
 
         except MoveFailedException:
             # Go back to the old position if the rotation failed.
-            self.cells = old_cells
+            self.rotation = old_rotation
+            self.x, self.y = old_x, old_y
             self.center = old_center
 
     def clone(self):
         block = Block(self.shape)
-        block.cells = set(self)
+        block.rotation = self.rotation
+        block.x, block.y = self.x, self.y
         block.center = self.center
         return block
 
+    def pack(self):
+        return (self.shape.value, self.rotation, self.x, self.y, self.center)
+
+    @staticmethod
+    def unpack(packed):
+        shape, rotation, x, y, center = packed
+        block = Block(Shape(shape))
+        block.rotation = rotation
+        block.x, block.y = x, y
+        block.center = center
+        return block
+
+
+# Points for clearing 0 to 4 lines with one block.
+LINE_SCORES = [0, 100, 400, 800, 1600]
+
+
+def add_cells(rows, fill, heights, holes, cells, x=0, y=0):
+    """
+    Adds the cells of a landed block, moved by (x, y), to the row masks and
+    their fill counts and updates the column heights and holes, all in place.
+    """
+
+    for dx, dy in cells:
+        column = x + dx
+        line = y + dy
+        rows[line] |= 1 << column
+        fill[line] += 1
+        height = len(rows) - line
+        if height > heights[column]:
+            # Everything between the old and the new top is now a hole.
+            holes[column] += height - heights[column] - 1
+            heights[column] = height
+        else:
+            holes[column] -= 1
+
+
+def remove_full_lines(rows, fill, heights, holes, width):
+    """
+    Removes the full lines from the row masks and their fill counts and
+    updates the column heights and holes, all in place. Returns the indices
+    of the removed lines.
+    """
+
+    height = len(rows)
+    removed = [line for line in range(height) if fill[line] == width]
+    if not removed:
+        return removed
+
+    count = len(removed)
+    rows[:] = [0] * count + [row for row, f in zip(rows, fill) if f != width]
+    fill[:] = [0] * count + [f for f in fill if f != width]
+
+    # Full lines hold no holes, so a column only changes beyond losing one
+    # cell per line if its topmost cell was on a removed line, in which case
+    # the holes above its new top disappear as well.
+    for x in range(width):
+        if not heights[x]:
+            continue
+        if height - heights[x] not in removed:
+            heights[x] -= count
+            continue
+        top = 0
+        empty = 0
+        for y in range(height):
+            if rows[y] >> x & 1:
+                if not top:
+                    top = height - y
+            elif top:
+                empty += 1
+        heights[x] = top
+        holes[x] = empty
+
+    return removed
+
 
 class Board(Bitmap):
     """
     Class that keeps track of occupied cells and the current falling block,
     as well as the score of the player. Can be used to duplicate the current
     state and explore possible future moves.
-    """
 
-    width = None
-    height = None
-    score = None
-    lock = None
+    Occupied cells are stored as one integer bitmask per row, where bit x of
+    rows[y] is set if and only if (x, y) is occupied. The height and number
+    of holes of every column and the number of cells in every row are kept
+    up to date as blocks land and lines are removed.
 
-    falling = None
-    next = None
-
-    players_turn = None
+    Boards shared between threads (such as the one drawn by visual.py) lock
+    every change; boards used by a single thread, including clones, can do
+    without.
+    """
 
-    def __init__(self, width, height, score=0):
+    __slots__ = (
+        "width",
+        "height",
+        "score",
+        "lines",
+        "pieces",
+        "lock",
+        "rows",
+        "full",
+        "_heights",
+        "_holes",
+        "_fill",
+        "cellcolor",
+        "falling",
+        "next",
+        "players_turn",
+    )
+
+    def __init__(self, width, height, score=0, threadsafe=True):
         self.width = width
         self.height = height
         self.score = score
-        self.cells = set()
+        self.lines = 0
+        self.pieces = 0
+        self.full = (1 << width) - 1
+        self.rows = [0] * height
+        self._heights = [0] * width
+        self._holes = [0] * width
+        self._fill = [0] * height
         self.cellcolor = {}
-        self.lock = Lock()
+        self.lock = Lock() if threadsafe else nullcontext()
+
+        self.falling = None
+        self.next = None
+
+        self.players_turn = None
+
+    @property
+    def cells(self):
+        """
+        The occupied cells as a set of (x, y) tuples, built from the row masks.
+        """
+
+        return {
+            (x, y)
+            for y, row in enumerate(self.rows)
+            if row
+            for x in range(self.width)
+            if row >> x & 1
+        }
+
+    @cells.setter
+    def cells(self, cells):
+        rows = [0] * self.height
+        for x, y in cells:
+            rows[y] |= 1 << x
+        self.rows = rows
+        self.measure()
+
+    @property
+    def key(self):
+        """
+        A hashable snapshot of the occupied cells, equal for two boards if
+        and only if they have the same cells.
+        """
+
+        return tuple(self.rows)
+
+    @property
+    def heights(self):
+        """
+        The height of every column, counted from the bottom of the board up
+        to and including its topmost occupied cell.
+        """
+
+        return self._heights
+
+    @property
+    def holes(self):
+        """
+        The number of empty cells below the topmost occupied cell of every
+        column.
+        """
+
+        return self._holes
+
+    @property
+    def fill(self):
+        """
+        The number of occupied cells in every row.
+        """
+
+        return self._fill
+
+    def measure(self):
+        """
+        Recomputes the column heights, holes and row fill counts from the
+        rows. Only needed when the rows are changed directly.
+        """
+
+        heights = [0] * self.width
+        holes = [0] * self.width
+        for y, row in enumerate(self.rows):
+            for x in range(self.width):
+                if row >> x & 1:
+                    if not heights[x]:
+                        heights[x] = self.height - y
+                elif heights[x]:
+                    holes[x] += 1
+
+        self._heights = heights
+        self._holes = holes
+        self._fill = [row.bit_count() for row in self.rows]
+
+    def __contains__(self, cell):
+        x, y = cell
+        return 0 <= x and 0 <= y < self.height and bool(self.rows[y] >> x & 1)
+
+    def overlaps(self, masks, x, y):
+        """
+        Checks if a block, given as row masks with its top-left corner at
+        (x, y), overlaps any occupied cell on the board.
+        """
+
+        rows = self.rows
+        height = self.height
+        for dy, mask in enumerate(masks):
+            row = y + dy
+            if 0 <= row < height:
+                shifted = mask << x if x >= 0 else mask >> -x
+                if rows[row] & shifted:
+                    return True
+        return False
 
     def line_full(self, line):
         """
         Checks if the given line is fully occupied by cells.
         """
 
-        return all((x, line) in self for x in range(0, self.width))
+        return self.rows[line] == self.full
 
     def remove_line(self, line):
         """
@@ -352,27 +656,55 @@ class Board(Bitmap):
             if y != line
         }
 
-        self.cells = {
-            (x, y) if y > line else (x, y + 1) for (x, y) in self if y != line
-        }
+        del self.rows[line]
+        self.rows.insert(0, 0)
+        del self._fill[line]
+        self._fill.insert(0, 0)
+
+        # Every column loses one cell; the columns whose topmost cell was on
+        # the line lose the holes that were directly beneath it as well.
+        heights = self._heights
+        holes = self._holes
+        top = self.height - line
+        for x in range(self.width):
+            if heights[x] == top:
+                height = 0
+                for y in range(line + 1, self.height):
+                    if self.rows[y] >> x & 1:
+                        height = self.height - y
+                        break
+                holes[x] -= top - 1 - height
+                heights[x] = height
+            else:
+                heights[x] -= 1
 
     def clean(self):
         """
-        Cleans all fully occupied lines from the bottom down, and moves lines
-        above the cleaned lines down as well.
+        Cleans all fully occupied lines and moves the lines above them down,
+        rebuilding the rows once however many lines are removed.
         """
 
-        scores = [0, 100, 400, 800, 1600]
-        removed = 0
-
-        line = self.height - 1
-        while line > 0:
-            while self.line_full(line):
-                self.remove_line(line)
-                removed += 1
-            line -= 1
+        removed = remove_full_lines(
+            self.rows, self._fill, self._heights, self._holes, self.width
+        )
+        if not removed:
+            return 0
+
+        # Every cell moves down by the number of removed lines beneath it.
+        shift = [0] * self.height
+        below = 0
+        for line in range(self.height - 1, -1, -1):
+            if line in removed:
+                below += 1
+            shift[line] = below
+        self.cellcolor = {
+            (x, y + shift[y]): c
+            for (x, y), c in self.cellcolor.items()
+            if y not in removed
+        }
 
-        return scores[removed]
+        self.lines += len(removed)
+        return LINE_SCORES[len(removed)]
 
     @property
     def alive(self):
@@ -404,15 +736,23 @@ class Board(Bitmap):
         self.next = Block(adversary.choose_block(self))
         return self.next.shape
 
-    def run_player(self, player):
+    def run_player(self, player, log=None):
         """
         Asks the player for the next action and executes that on the board.
         Returns a tuple of a boolean and the move made, where the boolean
-        indicates whether or not the current block has dropped.
+        indicates whether or not the current block has dropped. The block is
+        recorded in the log (see gamelog.py) once it has landed, if any.
         """
 
+        block = self.falling
+        score = self.score
+        lines = self.lines
+        seconds = 0
+
         while True:
+            start = perf_counter()
             actions = player.choose_action(self.clone())
+            seconds += perf_counter() - start
 
             try:
                 actions = iter(actions)
@@ -422,24 +762,37 @@ class Board(Bitmap):
 
             landed = False
             for action in actions:
-                if action is None:
-                    landed = self.skip()
-                if isinstance(action, Direction):
-                    landed = self.move(action)
-                elif isinstance(action, Rotation):
-                    landed = self.rotate(action)
+                landed = self.apply(action)
 
                 yield action
 
                 if landed:
+                    if log is not None:
+                        score = self.score - score
+                        log.piece(block, score, self.lines - lines, seconds)
                     return
 
-    def run(self, player, adversary):
+    def apply(self, action):
+        """
+        Executes a single action of a player on the board. Returns True if the
+        current block has dropped, False otherwise.
+        """
+
+        if action is None:
+            return self.skip()
+        if isinstance(action, Direction):
+            return self.move(action)
+        elif isinstance(action, Rotation):
+            return self.rotate(action)
+        return False
+
+    def run(self, player, adversary, log=None):
         """
         Run the game with the given adversary and player. Will yield control
         back to the calling function every time a move has been made. Yields
         shapes (of new blocks) and moves (directions/rotations) as produced
-        by the adversary or the player respectively.
+        by the adversary or the player respectively. Every block is recorded
+        in the log (a GameLog, see gamelog.py), if any.
         """
 
         # Initialize by choosing the "next" block first.
@@ -457,20 +810,144 @@ class Board(Bitmap):
                 return
 
             # Ask the player for the next move(s) to make.
-            yield from self.run_player(player)
+            yield from self.run_player(player, log)
+
+    def play_fast(self, player, adversary, log=None):
+        """
+        Runs the game like run does, but asks the player for a whole
+        placement of every block at once and lands the block there directly,
+        without yielding, cloning the board for the player or locking. The
+        player must implement choose_placement(board), returning either a
+        placement (see placement.py) or a tuple (column, rotation), and must
+        leave the board as it was given. Every block is recorded in the log,
+        as in run.
+        """
+
+        # Imported here since placement.py itself depends on this module.
+        from placement import find
+
+        self.run_adversary(adversary)
+        self.place_next_block()
+
+        while True:
+            self.run_adversary(adversary)
+
+            # The block may have caused the end of the game.
+            if self.falling.collides(self):
+                return
+
+            start = perf_counter()
+            placement = player.choose_placement(self)
+            seconds = perf_counter() - start
+            if isinstance(placement, tuple):
+                placement = find(self, *placement)
+
+            block = placement.block
+            score = self.score
+            lines = self.lines
+            self.falling = block
+            self.score += placement.score
+            self.land_block()
+
+            if log is not None:
+                log.piece(block, self.score - score, self.lines - lines, seconds)
 
     def land_block(self):
         # A fallen block becomes part of the cells on the board.
-        self.cells |= self.falling.cells
-        for pos in self.falling.cells:
-            self.cellcolor[pos] = self.falling.color
+        cells = list(self.falling)
+        add_cells(self.rows, self._fill, self._heights, self._holes, cells)
+        color = self.falling.color
+        for pos in cells:
+            self.cellcolor[pos] = color
         self.falling = None
+        self.pieces += 1
 
         # Clean up any completed rows and adjust score.
         self.score += self.clean()
 
         self.place_next_block()
 
+    def place(self, placement):
+        """
+        Moves the current block straight to the final resting position given
+        by a placement (see placement.py) and lands it there, scoring the same
+        points as playing out the actions of the placement would. Returns a
+        token that can be passed to undo to revert the board to its state
+        before the placement.
+        """
+
+        if self.falling is None:
+            raise NoBlockException
+
+        with self.lock:
+            block = placement.block
+            next = self.next
+            token = (
+                self.rows,
+                self._heights,
+                self._holes,
+                self._fill,
+                self.score,
+                self.lines,
+                self.pieces,
+                self.cellcolor,
+                tuple(block),
+                self.falling,
+                next,
+                next and (next.rotation, next.x, next.y, next.center),
+            )
+
+            # The old rows stay untouched in the token; work on copies.
+            self.rows = list(self.rows)
+            self._heights = list(self._heights)
+            self._holes = list(self._holes)
+            self._fill = list(self._fill)
+            self.falling = block
+            self.score += placement.score
+            self.land_block()
+
+        return token
+
+    def undo(self, token):
+        """
+        Reverts the board to its state before the placement that returned the
+        given token. Placements must be undone in reverse order.
+        """
+
+        (
+            rows,
+            heights,
+            holes,
+            fill,
+            score,
+            lines,
+            pieces,
+            cellcolor,
+            cells,
+            falling,
+            next,
+            state,
+        ) = token
+
+        with self.lock:
+            self.rows = rows
+            self._heights = heights
+            self._holes = holes
+            self._fill = fill
+            self.score = score
+            self.lines = lines
+            self.pieces = pieces
+
+            # Landing only ever adds the cells of the block to the old colors.
+            for pos in cells:
+                del cellcolor[pos]
+            self.cellcolor = cellcolor
+
+            self.falling = falling
+            self.next = next
+            if next is not None:
+                next.rotation, next.x, next.y, next.center = state
+
     def move(self, direction):
         """
         Moves the current block in the direction given, and applies the
@@ -528,13 +1005,19 @@ class Board(Bitmap):
                 self.land_block()
             return res
 
-    def clone(self):
+    def clone(self, threadsafe=False):
         """
         Creates a copy of the board; can be used to simulate possible moves.
+        The copy has no lock unless threadsafe is given.
         """
 
-        board = Board(self.width, self.height, self.score)
-        board.cells = set(self)
+        board = Board(self.width, self.height, self.score, threadsafe)
+        board.lines = self.lines
+        board.pieces = self.pieces
+        board.rows = list(self.rows)
+        board._heights = list(self._heights)
+        board._holes = list(self._holes)
+        board._fill = list(self._fill)
 
         # Copy the falling block, if any.
         if self.falling is not None:
@@ -545,3 +1028,35 @@ class Board(Bitmap):
             board.next = self.next.clone()
 
         return board
+
+    def pack(self):
+        """
+        Returns a compact tuple describing the board, cheap to send to other
+        processes. The colors of the cells are not included.
+        """
+
+        return (
+            self.width,
+            self.height,
+            self.score,
+            tuple(self.rows),
+            self.falling and self.falling.pack(),
+            self.next and self.next.pack(),
+        )
+
+    @staticmethod
+    def unpack(packed):
+        """
+        Creates a board from the result of pack.
+        """
+
+        width, height, score, rows, falling, next = packed
+
+        board = Board(width, height, score, threadsafe=False)
+        board.rows = list(rows)
+        board.measure()
+        if falling is not None:
+            board.falling = Block.unpack(falling)
+        if next is not None:
+            board.next = Block.unpack(next)
+        return board
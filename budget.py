@@ -0,0 +1,60 @@
+import time
+
+from constants import BLOCK_LIMIT, TIME_LIMIT
+
+
+class TimeBudget:
+    """
+    Shares the time a game may take between its blocks. Every move gets an
+    equal share of the time that is left, so time saved on easy moves can be
+    spent on later ones, and time lost outside the player (for example in
+    the game itself) is taken into account.
+    """
+
+    total = None
+    blocks = None
+    reserve = None
+    clock = None
+
+    start = None
+    moves = None
+
+    def __init__(self, total=TIME_LIMIT, blocks=BLOCK_LIMIT, reserve=0.2, clock=None):
+        """
+        total is the time in seconds the game may take, of which the fraction
+        reserve is kept as a safety margin. clock defaults to wall time; pass
+        time.process_time to budget CPU time instead.
+        """
+
+        self.total = total
+        self.blocks = blocks
+        self.reserve = reserve
+        self.clock = clock or time.monotonic
+        self.moves = 0
+
+    @property
+    def elapsed(self):
+        if self.start is None:
+            return 0
+        return self.clock() - self.start
+
+    @property
+    def remaining(self):
+        return max(self.total * (1 - self.reserve) - self.elapsed, 0)
+
+    def deadline(self):
+        """
+        Starts a move and returns the time on the clock by which it should
+        be decided.
+        """
+
+        now = self.clock()
+        if self.start is None:
+            self.start = now
+
+        left = max(self.blocks - self.moves, 1)
+        self.moves += 1
+        return now + self.remaining / left
+
+    def expired(self, deadline):
+        return self.clock() > deadline
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from sys import getsizeof
+
+# Rough cost of one entry in the OrderedDict itself (hash slot and links).
+ENTRY_OVERHEAD = 100
+
+
+def sizeof(value):
+    """
+    Estimates the memory used by a value, following tuples and lists.
+    """
+
+    size = getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(sizeof(item) for item in value)
+    return size
+
+
+class TranspositionTable:
+    """
+    A bounded least-recently-used cache of evaluation results. MyPlayer keys
+    it by (board key, falling shape, next shape), see key, and
+    BeamSearchPlayer by (board key, falling shape). Entries are evicted once
+    the estimated memory used by the table exceeds the given number of bytes.
+    """
+
+    memory = None
+    size = None
+    entries = None
+
+    hits = None
+    misses = None
+    evictions = None
+
+    def __init__(self, memory=64 * 1024 * 1024):
+        self.memory = memory
+        self.clear()
+
+    def clear(self):
+        self.size = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(board):
+        """
+        The key of a board, covering everything an evaluation depends on.
+        """
+
+        falling = board.falling and board.falling.shape
+        next = board.next and board.next.shape
+        return (board.key, falling, next)
+
+    def get(self, key):
+        """
+        Returns the cached result for the key, or None if there is none.
+        """
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+
+        size = sizeof(key) + sizeof(value) + ENTRY_OVERHEAD
+        self.entries[key] = (value, size)
+        self.size += size
+
+        while self.size > self.memory and self.entries:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
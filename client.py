@@ -1,9 +1,12 @@
-from adversary import RandomAdversary
-from board import Board, Direction, Rotation, Shape
+import protocol
+from adversary import LookaheadAdversary, RandomAdversary
+from board import Board, Shape
 from constants import BOARD_HEIGHT, BOARD_WIDTH, BLOCK_LIMIT, PREFIX
 from exceptions import UnknownInstructionException, BlockLimitException
+from placement import find
 from player import Player
 
+import sys
 from sys import stderr
 from os import getenv
 
@@ -19,42 +22,96 @@ class RemotePlayer(Player):
             if instruction.startswith(PREFIX):
                 break
 
-        instruction = instruction[len(PREFIX) + 1 :]
+        return protocol.parse_action(instruction[len(PREFIX) + 1 :])
 
-        if instruction == "SKIP":
-            return None
 
-        try:
-            return Direction(instruction)
-        except ValueError:
-            pass
+class BinaryRemotePlayer(Player):
+    """
+    Reads the moves of the player in the binary mode of the protocol (see
+    protocol.py), one message per call.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
 
+    def choose_action(self, board):
         try:
-            return Rotation(instruction)
-        except ValueError:
-            pass
+            move = protocol.read_move(self.stream)
+        except EOFError:
+            raise UnknownInstructionException
+
+        if isinstance(move, tuple):
+            # The final column and rotation of the block.
+            return find(board, *move).actions
 
-        raise UnknownInstructionException
+        return move
 
 
 board = Board(BOARD_WIDTH, BOARD_HEIGHT)
 
-player = RemotePlayer()
 adversary = RandomAdversary(getenv("SEED"), BLOCK_LIMIT)
 
+# Offer the binary mode if PROTOCOL=BINARY is set and a lookahead window if
+# LOOKAHEAD is set, to a player that has said it knows the modes, and fall
+# back to the text mode without lookahead unless the player accepts them.
+mode = protocol.TEXT
+window = 0
+offered = getenv("PROTOCOL", protocol.TEXT).upper()
+lookahead = int(getenv("LOOKAHEAD") or 0)
+if (offered == protocol.BINARY or lookahead) and protocol.wait_hello(
+    sys.stdin.buffer
+):
+    print(protocol.mode_message(offered, lookahead), flush=True)
+    line = protocol.read_line(sys.stdin.buffer)
+    answer = line and protocol.parse_mode(line)
+    if answer:
+        mode, window = answer
+
+if mode == protocol.BINARY:
+    player = BinaryRemotePlayer(sys.stdin.buffer)
+else:
+    player = RemotePlayer()
+
+
+def send(shape):
+    if mode == protocol.BINARY:
+        sys.stdout.buffer.write(protocol.encode_shape(shape))
+        sys.stdout.buffer.flush()
+    else:
+        print(f"{PREFIX} {shape.value}")
+
+
+def end(marker):
+    if mode == protocol.BINARY:
+        sys.stdout.buffer.write(protocol.encode_marker(marker))
+        sys.stdout.buffer.flush()
+    else:
+        print(f"{PREFIX} {marker}")
+
+
+def announce(shape):
+    if shape is None:
+        end(protocol.END)
+    else:
+        send(shape)
+
+
+if window:
+    # The shapes are sent as soon as they are drawn instead.
+    adversary = LookaheadAdversary(adversary, window, announce)
 
 score = 0
 try:
     for move in board.run(player, adversary):
-        if isinstance(move, Shape):
-            print(f"{PREFIX} {move.value}")
+        if isinstance(move, Shape) and not window:
+            send(move)
 
         if board.score != score:
             stderr.write(f"{board.score}\n")
             score = board.score
 except BlockLimitException:
     stderr.write("WON\n")
-    print(f"{PREFIX} WON")
+    end(protocol.WON)
 else:
     stderr.write("LOST\n")
-    print(f"{PREFIX} LOST")
+    end(protocol.LOST)
@@ -10,3 +10,5 @@ INTERVAL = 1000
 PREFIX = "<TETRIS WIRE PROTOCOL>"
 
 DEFAULT_WEIGHTS = [1004, 2, 9.9, 205, 150.1, -296]
+
+TIME_LIMIT = 15 * 60
@@ -0,0 +1,226 @@
+"""
+A corpus of block sequences and recorded games in one flat binary file,
+read through mmap so that the processes of a training run share the same
+pages instead of every one deriving or copying the sequences.
+
+The file starts with a header, followed by a table of the sequences (seed,
+offset and length of the shapes), a table of the games (index of the
+sequence, offset and number of pieces, final score) and the data: one byte
+per shape (see adversary.SHAPES) and one record per piece of a game with the
+rotation, column and row of its placement and the score after it.
+"""
+
+import argparse
+import mmap
+import struct
+from functools import lru_cache
+
+from adversary import RandomAdversary
+from board import Board
+from constants import BOARD_HEIGHT, BOARD_WIDTH, BLOCK_LIMIT
+from exceptions import BlockLimitException
+from placement import find
+
+MAGIC = b"TCRP"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHII")  # magic, version, unused, sequences, games
+SEQUENCE = struct.Struct("<qQI")  # seed, offset, length
+GAME = struct.Struct("<IQIq")  # sequence, offset, pieces, score
+PIECE = struct.Struct("<BBBxi")  # rotation, x, y, score after the piece
+
+
+def write(path, sequences, games=()):
+    """
+    Writes a corpus file. sequences is a list of (seed, shape indices) and
+    games a list of (index of the sequence, pieces), where every piece is a
+    tuple of the rotation, column, row and score after the piece.
+    """
+
+    games = list(games)
+    offset = HEADER.size + SEQUENCE.size * len(sequences) + GAME.size * len(games)
+
+    tables = [HEADER.pack(MAGIC, VERSION, 0, len(sequences), len(games))]
+    data = []
+    for seed, shapes in sequences:
+        tables.append(SEQUENCE.pack(seed, offset, len(shapes)))
+        data.append(bytes(shapes))
+        offset += len(shapes)
+
+    for sequence, pieces in games:
+        score = pieces[-1][3] if pieces else 0
+        tables.append(GAME.pack(sequence, offset, len(pieces), score))
+        data += [PIECE.pack(*piece) for piece in pieces]
+        offset += PIECE.size * len(pieces)
+
+    with open(path, "wb") as file:
+        file.writelines(tables + data)
+
+
+class Corpus:
+    """
+    A corpus file opened for reading. Sequences and games are read straight
+    from the mapped file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self.map)
+
+        magic, version, _, sequences, games = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a corpus file")
+
+        offset = HEADER.size
+        self.sequences = [
+            SEQUENCE.unpack_from(self.data, offset + SEQUENCE.size * index)
+            for index in range(sequences)
+        ]
+        offset += SEQUENCE.size * sequences
+        self.games = [
+            GAME.unpack_from(self.data, offset + GAME.size * index)
+            for index in range(games)
+        ]
+        self.index = {
+            seed: index for index, (seed, _, _) in enumerate(self.sequences)
+        }
+
+    def __len__(self):
+        return len(self.sequences)
+
+    @property
+    def seeds(self):
+        return [seed for seed, _, _ in self.sequences]
+
+    def sequence(self, seed):
+        """
+        Returns the shape indices of the sequence of a seed, without copying.
+        """
+
+        _, offset, length = self.sequences[self.index[seed]]
+        return self.data[offset : offset + length]
+
+    def adversary(self, seed, blocks=None):
+        """
+        Returns a RandomAdversary that replays the sequence of a seed and
+        draws the blocks after it from the seed, or draws them all from the
+        seed if the corpus does not have it. Either way it chooses the same
+        blocks as RandomAdversary(seed, blocks).
+        """
+
+        if seed not in self.index:
+            return RandomAdversary(seed, blocks)
+        return RandomAdversary(seed, blocks, sequence=self.sequence(seed))
+
+    def game(self, number):
+        """
+        Returns the seed and the pieces of a recorded game, see write.
+        """
+
+        sequence, offset, pieces, _ = self.games[number]
+        end = offset + PIECE.size * pieces
+        pieces = list(PIECE.iter_unpack(self.data[offset:end]))
+        return self.sequences[sequence][0], pieces
+
+    def close(self):
+        """
+        Unmaps the file, unless it is already closed. The sequences and
+        adversaries taken from the corpus read straight from the mapped file,
+        so they have to be dropped first; until then this raises BufferError
+        and leaves the corpus open.
+        """
+
+        if self.map.closed:
+            return
+
+        self.data.release()
+        try:
+            self.map.close()
+        except BufferError:
+            self.data = memoryview(self.map)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@lru_cache(maxsize=None)
+def open_corpus(path):
+    """
+    Opens a corpus once per process.
+    """
+
+    return Corpus(path)
+
+
+class Recorder:
+    """
+    Wraps a player that chooses placements (see Board.play_fast) and records
+    the placement of every piece.
+    """
+
+    def __init__(self, player):
+        self.player = player
+        self.placements = []
+        self.scores = []  # the score before every piece.
+
+    def choose_placement(self, board):
+        placement = self.player.choose_placement(board)
+        if isinstance(placement, tuple):
+            placement = find(board, *placement)
+        self.placements.append(placement)
+        self.scores.append(board.score)
+        return placement
+
+    def pieces(self, score):
+        """
+        Returns the recorded pieces as written to a corpus, given the final
+        score of the game.
+        """
+
+        after = self.scores[1:] + [score]
+        return [(p.rotation, p.x, p.y, s) for p, s in zip(self.placements, after)]
+
+
+def record(player, adversary):
+    """
+    Plays a game and returns its pieces as written to a corpus.
+    """
+
+    board = Board(BOARD_WIDTH, BOARD_HEIGHT, threadsafe=False)
+    recorder = Recorder(player)
+    try:
+        board.play_fast(recorder, adversary)
+    except BlockLimitException:
+        pass
+    return recorder.pieces(board.score)
+
+
+if __name__ == "__main__":
+    from player import MyPlayer
+    from trainer import load_seeds
+
+    parser = argparse.ArgumentParser(description="Write a corpus of Tetris games")
+    parser.add_argument("output", help="Path of the corpus file")
+    parser.add_argument("seeds", nargs="*", type=int, help="Seeds of the sequences")
+    parser.add_argument("--blocks", "-b", type=int, default=BLOCK_LIMIT)
+    parser.add_argument(
+        "--record", "-r", action="store_true", help="Record a game per seed"
+    )
+    args = parser.parse_args()
+
+    seeds = args.seeds or load_seeds()
+    sequences = [
+        (seed, RandomAdversary(seed, args.blocks).sequence) for seed in seeds
+    ]
+    games = []
+    if args.record:
+        for index, (seed, shapes) in enumerate(sequences):
+            adversary = RandomAdversary(seed, args.blocks, sequence=shapes)
+            games.append((index, record(MyPlayer(), adversary)))
+
+    write(args.output, sequences, games)
@@ -0,0 +1,49 @@
+"""
+The features of a board after a block has landed and their weight, shared by
+Candidate and Search so that both score a board the same way. batch.py
+computes the same with NumPy for many boards at once.
+"""
+
+
+def peaks(heights, height):
+    """
+    Returns the y coordinate of the top of each column (the height of the
+    board if empty).
+    """
+
+    return [height - i for i in heights]
+
+
+def height_range(heights):
+    return max(heights) - min(heights)
+
+
+def var_height(peaks):
+    """
+    Returns an equivalent of the variance of the peaks, multiplied by their
+    number to avoid the division.
+    """
+
+    return sum(i**2 for i in peaks) * len(peaks) - (sum(peaks)) ** 2
+
+
+def mean_height(peaks, height):
+    return height - sum(peaks) / len(peaks)
+
+
+def weigh(weights, holes, height_range, var_height, mean_height, bottom_holes, score):
+    """
+    Returns the weight of a board from its features, lower being better.
+    weights are the coefficients of holes, height_range, var_height, mean_height,
+    bottom_holes and score, in that order.
+    """
+
+    parameters = [
+        holes / 230,
+        height_range / 23,
+        var_height / 144,
+        mean_height / 240,
+        bottom_holes / 100,
+        score / 16,
+    ]
+    return sum(weights[i] * parameters[i] for i in range(len(weights)))
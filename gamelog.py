@@ -0,0 +1,139 @@
+"""
+A compact log of a game with one fixed-size record per piece, written by
+Board.run and Board.play_fast, and a replayer that rebuilds the board after
+any number of pieces from it without asking the player again.
+
+The file starts with a header (magic, version and the size of the board),
+followed by a record per piece: the shape (see adversary.SHAPES), the final
+rotation, column and row of the block, the lines it cleared, the points it
+scored and the seconds the player took to decide on it.
+"""
+
+import argparse
+import struct
+
+from adversary import SHAPES
+from board import LINE_SCORES, Block, Board
+from placement import Placement
+
+MAGIC = b"TLOG"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHBB")  # magic, version, width, height
+PIECE = struct.Struct("<BBBBB3xIf")  # shape, rotation, x, y, lines, score, time
+
+
+class GameLog:
+    """
+    Writes the log of a game to a file, flushing it after every piece so that
+    the log of an interrupted game can still be read.
+    """
+
+    def __init__(self, path, width, height):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, width, height))
+
+    def piece(self, block, score, lines, seconds):
+        """
+        Records a block that has landed, the points it scored, the lines it
+        cleared and the time taken to decide on it.
+        """
+
+        self.file.write(
+            PIECE.pack(
+                SHAPES.index(block.shape),
+                block.rotation,
+                block.x,
+                block.y,
+                lines,
+                score,
+                seconds,
+            )
+        )
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read(path):
+    """
+    Returns the width and height of the board and the pieces of a log, every
+    piece being a tuple of the shape, rotation, column, row, lines, points
+    and decision time.
+    """
+
+    with open(path, "rb") as file:
+        data = file.read()
+
+    magic, version, width, height = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a game log")
+
+    # An interrupted write may have left part of a record at the end.
+    end = len(data) - (len(data) - HEADER.size) % PIECE.size
+    pieces = [
+        (SHAPES[shape], rotation, x, y, lines, score, seconds)
+        for shape, rotation, x, y, lines, score, seconds in PIECE.iter_unpack(
+            data[HEADER.size : end]
+        )
+    ]
+    return width, height, pieces
+
+
+def replay(path, pieces=None):
+    """
+    Rebuilds the board of a logged game after the given number of pieces
+    (all of them by default), landing every block straight where it landed
+    in the game. The falling and next blocks are those of the following
+    pieces, if logged.
+    """
+
+    width, height, log = read(path)
+    if pieces is None:
+        pieces = len(log)
+
+    board = Board(width, height, threadsafe=False)
+    for shape, rotation, x, y, lines, score, _ in log[:pieces]:
+        # place needs a falling block; it is replaced by the placed one.
+        board.falling = Block(shape)
+        board.next = None
+        drop = score - LINE_SCORES[lines]
+        board.place(Placement(shape, rotation, x, y, [], score=drop))
+
+    upcoming = [piece[0] for piece in log[pieces : pieces + 2]]
+    if upcoming:
+        board.falling = Block(upcoming[0])
+        board.falling.initialize(board)
+    if len(upcoming) > 1:
+        board.next = Block(upcoming[1])
+    return board
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise a Tetris game log")
+    parser.add_argument("log", help="Path of the game log")
+    parser.add_argument(
+        "--slowest", "-s", type=int, default=5, help="Number of slowest pieces"
+    )
+    args = parser.parse_args()
+
+    _, _, log = read(args.log)
+    score = sum(piece[5] for piece in log)
+    lines = sum(piece[4] for piece in log)
+    seconds = sum(piece[6] for piece in log)
+    print(f"{len(log)} pieces, {score} points, {lines} lines, {seconds:.1f}s")
+
+    slowest = sorted(range(len(log)), key=lambda index: -log[index][6])
+    for index in slowest[: args.slowest]:
+        shape, rotation, x, y, lines, score, seconds = log[index]
+        print(
+            f"piece {index}: {shape.value} at ({x}, {y}) rotation {rotation}, "
+            f"{score} points, {seconds:.3f}s"
+        )
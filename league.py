@@ -0,0 +1,229 @@
+"""
+Hosts many games at once over TCP or a Unix socket, for evaluating players
+against several seeds in parallel without a pair of processes per game.
+
+Every connection is a separate game with its own board and adversary, played
+with the text protocol of client.py, so an unchanged player program such as
+server.py can take part through the connect command, which runs it with the
+socket as its standard input and output:
+
+    python league.py serve --port 7000 42 7 13
+    python league.py connect --port 7000 --games 3 python server.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import protocol
+from adversary import RandomAdversary
+from board import Board
+from constants import BOARD_HEIGHT, BOARD_WIDTH, BLOCK_LIMIT, PREFIX
+from exceptions import BlockLimitException, UnknownInstructionException
+
+
+class Session:
+    """
+    One game of the server, with its own board, adversary and block limit,
+    and the throughput of the player connected to it.
+    """
+
+    def __init__(self, number, seed, blocks=BLOCK_LIMIT):
+        self.number = number
+        self.seed = seed
+        self.board = Board(BOARD_WIDTH, BOARD_HEIGHT, threadsafe=False)
+        self.adversary = RandomAdversary(seed, blocks)
+        self.result = None  # WON, LOST or the reason the game was stopped.
+        self.actions = 0
+        self.received = 0  # bytes
+        self.sent = 0  # bytes
+        self.start = time.perf_counter()
+        self.end = None
+
+    def stats(self):
+        elapsed = (self.end or time.perf_counter()) - self.start
+        return {
+            "session": self.number,
+            "seed": self.seed,
+            "result": self.result,
+            "score": self.board.score,
+            "lines": self.board.lines,
+            "pieces": self.board.pieces,
+            "actions": self.actions,
+            "received": self.received,
+            "sent": self.sent,
+            "time": elapsed,
+            "pieces_per_second": self.board.pieces / elapsed if elapsed else 0,
+            "actions_per_second": self.actions / elapsed if elapsed else 0,
+        }
+
+    async def play(self, reader, writer):
+        """
+        Plays the game with the player on the other end of the streams, in
+        the same order as Board.run.
+        """
+
+        board = self.board
+
+        async def send(message):
+            data = f"{PREFIX} {message}\n".encode()
+            self.sent += len(data)
+            writer.write(data)
+            await writer.drain()
+
+        async def receive():
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise EOFError
+                self.received += len(line)
+
+                # undecodable bytes can not be a valid instruction anyway.
+                instruction = line.decode(errors="replace").strip()
+                if instruction.startswith(PREFIX):
+                    return protocol.parse_action(instruction[len(PREFIX) + 1 :])
+
+        try:
+            await send(board.run_adversary(self.adversary).value)
+            board.place_next_block()
+
+            while True:
+                await send(board.run_adversary(self.adversary).value)
+                if not board.alive:
+                    self.result = protocol.LOST
+                    break
+
+                landed = False
+                while not landed:
+                    landed = board.apply(await receive())
+                    self.actions += 1
+        except BlockLimitException:
+            self.result = protocol.WON
+        except (EOFError, ConnectionError):
+            self.result = "DISCONNECTED"
+        except UnknownInstructionException:
+            self.result = "UNKNOWN INSTRUCTION"
+        finally:
+            self.end = time.perf_counter()
+
+        if self.result in (protocol.WON, protocol.LOST):
+            try:
+                await send(self.result)
+            except ConnectionError:
+                # The player left before the end; the result stands.
+                pass
+
+
+class LeagueServer:
+    """
+    Starts a new session for every connection, playing the given seeds in
+    turn.
+    """
+
+    def __init__(self, seeds, blocks=BLOCK_LIMIT, log=sys.stderr):
+        self.seeds = seeds
+        self.blocks = blocks
+        self.log = log
+        self.sessions = []
+
+    def stats(self):
+        return [session.stats() for session in self.sessions]
+
+    async def handle(self, reader, writer):
+        number = len(self.sessions)
+        session = Session(number, self.seeds[number % len(self.seeds)], self.blocks)
+        self.sessions.append(session)
+
+        try:
+            await session.play(reader, writer)
+        finally:
+            writer.close()
+
+        if self.log is not None:
+            stats = session.stats()
+            self.log.write(
+                f"session {stats['session']} seed {stats['seed']}: "
+                f"{stats['result']} {stats['score']} ({stats['pieces']} pieces, "
+                f"{stats['pieces_per_second']:.1f} pieces/s, "
+                f"{stats['actions_per_second']:.1f} actions/s)\n"
+            )
+
+    async def serve(self, host="127.0.0.1", port=None, path=None):
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+
+        async with server:
+            await server.serve_forever()
+
+
+def connect(command, host="127.0.0.1", port=None, path=None, games=1):
+    """
+    Runs games copies of a player program at once, each connected to a new
+    session of the server through its standard input and output. Returns the
+    exit codes of the programs.
+    """
+
+    # Players print their moves; make sure they are not held in a buffer.
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+
+    processes = []
+    for _ in range(games):
+        if path is not None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.connect(path)
+        else:
+            connection = socket.create_connection((host, port))
+
+        processes.append(
+            subprocess.Popen(
+                command, stdin=connection, stdout=connection, env=env
+            )
+        )
+        # The program keeps its own copy of the socket.
+        connection.close()
+
+    return [process.wait() for process in processes]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host or join many Tetris games")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Host the games")
+    serve.add_argument("seeds", nargs="*", type=int, help="Seeds to play in turn")
+    serve.add_argument("--blocks", "-b", type=int, default=BLOCK_LIMIT)
+    serve.add_argument("--stats", help="Write the session stats to a JSON file")
+
+    join = commands.add_parser("connect", help="Run a player program per game")
+    join.add_argument("program", nargs=argparse.REMAINDER, help="Player command")
+    join.add_argument("--games", "-n", type=int, default=1)
+
+    for command in (serve, join):
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", "-p", type=int, default=7000)
+        command.add_argument("--unix", "-u", help="Use a Unix socket at this path")
+
+    args = parser.parse_args()
+
+    if args.command == "connect":
+        codes = connect(args.program, args.host, args.port, args.unix, args.games)
+        raise SystemExit(max(codes, default=0))
+
+    from trainer import load_seeds
+
+    league = LeagueServer(args.seeds or load_seeds(), args.blocks)
+    try:
+        asyncio.run(league.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.stats:
+            with open(args.stats, "w") as file:
+                json.dump(league.stats(), file, indent=2)
@@ -0,0 +1,214 @@
+from board import Block, Direction, Rotation, shape_to_orientations
+from exceptions import UnknownInstructionException
+
+
+# Fewest rotations that turn the initial orientation into orientation i.
+rotation_to_actions = {
+    0: [],
+    1: [Rotation.Clockwise],
+    2: [Rotation.Anticlockwise, Rotation.Anticlockwise],
+    3: [Rotation.Anticlockwise],
+}
+
+
+class Placement:
+    """
+    A final resting position of a block, together with the actions that
+    bring a freshly placed block there and the points scored by dropping it.
+    """
+
+    shape = None
+    rotation = None
+    x = None
+    y = None
+    actions = None
+    score = None
+
+    def __init__(self, shape, rotation, x, y, actions, score=0):
+        self.shape = shape
+        self.rotation = rotation
+        self.x = x
+        self.y = y
+        self.actions = actions
+        self.score = score
+
+    @property
+    def block(self):
+        """
+        A block resting at this placement.
+        """
+
+        block = Block(self.shape)
+        block.rotation = self.rotation
+        block.x, block.y = self.x, self.y
+        return block
+
+    @property
+    def cells(self):
+        return set(self.block)
+
+    @property
+    def orientation(self):
+        return shape_to_orientations[self.shape][self.rotation]
+
+    def overlay(self, rows):
+        """
+        Returns a copy of the given row masks with the block added, before
+        any full lines are removed.
+        """
+
+        rows = list(rows)
+        for dy, mask in enumerate(self.orientation.masks):
+            rows[self.y + dy] |= mask << self.x
+        return rows
+
+    def __call__(self):
+        return (self.x, self.rotation)
+
+
+def surface(board):
+    """
+    Returns the topmost occupied row of every column, or the height of the
+    board if the column is empty.
+    """
+
+    return [board.height - height for height in board.heights]
+
+
+def simulate(block, board, actions):
+    """
+    Applies actions to a block the same way Board.move and Board.rotate do,
+    including the implicit move down, without landing it on the board.
+    Returns the number of points scored on the way and whether the block
+    has landed.
+    """
+
+    score = board.score
+    landed = False
+    for action in actions:
+        if isinstance(action, Direction):
+            landed = block.move(action, board)
+        else:
+            block.rotate(action, board)
+            landed = False
+
+        if landed or block.move(Direction.Down, board):
+            landed = True
+            break
+
+    points = board.score - score
+    board.score = score
+    return points, landed
+
+
+def moves(shift):
+    """
+    Returns the sideways moves that shift a block by the given number of
+    columns, to the right if positive and to the left if negative.
+    """
+
+    if shift > 0:
+        return [Direction.Right] * shift
+    return [Direction.Left] * -shift
+
+
+def positions(board, shape=None):
+    """
+    Yields every distinct final resting position of a block of the given
+    shape, or of the falling block if no shape is given. Blocks are rotated
+    first, then moved sideways and then dropped. Every position is a tuple
+    of the rotation, the column and row of the top-left corner, the points
+    scored by dropping the block and the number of columns it is moved by
+    (None if it lands while rotating).
+    """
+
+    if shape is None:
+        spawn = board.falling
+    else:
+        spawn = Block(shape)
+        spawn.initialize(board)
+
+    heights = surface(board)
+    ceiling = min(heights)
+
+    seen = set()
+    for rotation in range(4):
+        rotated = spawn.clone()
+        score, landed = simulate(rotated, board, rotation_to_actions[rotation])
+        if rotated.rotation != rotation:
+            # The rotation was blocked; this orientation can not be reached.
+            continue
+
+        orientation = rotated.orientation
+        if landed:
+            # The block landed while rotating; it can not be moved any more.
+            columns = [rotated.x]
+        else:
+            columns = range(board.width - orientation.width + 1)
+
+        for x in columns:
+            shift = x - rotated.x
+
+            if landed:
+                y = rotated.y
+                points = score
+                shift = None
+            elif rotated.y + orientation.height + abs(shift) < ceiling:
+                # The block stays above every column on its way; drop it
+                # straight onto the highest column below it.
+                y = min(
+                    heights[x + column] - bottom - 1
+                    for column, bottom in enumerate(orientation.profile)
+                )
+                points = score + y - rotated.y
+            else:
+                block = rotated.clone()
+                points, _ = simulate(block, board, moves(shift) + [Direction.Drop])
+                points += score
+                if block.x != x:
+                    # Something is in the way.
+                    continue
+                y = block.y
+
+            key = (orientation.cells, x, y)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield rotation, x, y, points, shift
+
+
+def placements(board, shape=None):
+    """
+    Lists every distinct final resting position of a block of the given
+    shape, or of the falling block if no shape is given, in the order of
+    positions.
+    """
+
+    if shape is None:
+        shape = board.falling.shape
+        spawn = None
+    else:
+        spawn = shape
+
+    result = []
+    for rotation, x, y, points, shift in positions(board, spawn):
+        actions = rotation_to_actions[rotation]
+        if shift is not None:
+            actions = actions + moves(shift) + [Direction.Drop]
+        result.append(Placement(shape, rotation, x, y, actions, score=points))
+
+    return result
+
+
+def find(board, column, rotation):
+    """
+    Returns the placement of the falling block that rests in the given column
+    with the given rotation, as chosen by a player that answers with a tuple
+    (see Board.play_fast). Raises UnknownInstructionException if the block
+    can not rest there.
+    """
+
+    for placement in placements(board):
+        if placement() == (column, rotation):
+            return placement
+    raise UnknownInstructionException
@@ -1,7 +1,13 @@
-from board import Direction, Rotation
+from board import Block, Board, Direction, Rotation, Shape
+from placement import Placement
+from placement import find, placements
+from search import Search
+import batch
+import features
 from random import Random, choice
 import time
 import multiprocessing as mp
+import struct
 from constants import DEFAULT_WEIGHTS
 
 
@@ -23,8 +29,50 @@ class Candidate:
     Contains some data and function that help choose_action().
     """
 
-    def __init__(self, board=None, target=0, rotation=0, weights=DEFAULT_WEIGHTS):
+    __slots__ = (
+        "board",
+        "cache",
+        "placement",
+        "target",
+        "rotation_target",
+        "rotation_count",
+        "cells",
+        "bottom_holes",
+        "mean_height",
+        "var_height",
+        "holes",
+        "range",
+        "score",
+        "board_score",
+        "next_mean_height",
+        "next_var_height",
+        "next_holes",
+        "next_bottom_holes",
+        "next_range",
+        "weights",
+        "weight",
+        "profile",
+        "search",
+    )
+
+    def __init__(
+        self,
+        board=None,
+        target=0,
+        rotation=0,
+        weights=DEFAULT_WEIGHTS,
+        placement=None,
+        cache=None,
+        profile=None,
+        search=None,
+    ):
         self.board = board
+        self.search = search  # a Search for the next block, shared between candidates if given.
+        self.cache = cache  # a TranspositionTable for the results of the next block, if any.
+        self.profile = profile  # a Profile to record into, if any.
+        self.placement = placement  # the final position of the block, if known.
+        if placement is not None:
+            target, rotation = placement()
         self.target = (
             target  # the number of horizontal translation required by the block.
         )
@@ -57,7 +105,7 @@ class Candidate:
             rotation  # the number of anciclockwise rotation required for the block.
         )
         self.rotation_count = 0
-        self.cells = {i: [] for i in range(self.board.width)}
+        self.cells = None  # the cells according to column number, see update_cells().
 
         # parameters for the move of the current block.
         self.bottom_holes = -1
@@ -66,6 +114,7 @@ class Candidate:
         self.holes = -1
         self.range = -1
         self.score = 0
+        self.board_score = 0  # the score of the board after the move.
 
         # parameters for the best move of the next block
         self.next_mean_height = -1
@@ -81,17 +130,14 @@ class Candidate:
         """
         Generate the weight for the move.
         """
-        coefficients = self.weights
-        parameters = [
-            self.get_holes() / 230,
-            self.get_range() / 23,
-            self.get_var_height() / 144,
-            self.get_mean_height() / 240,
-            self.get_bottom_holes() / 100,
-            self.score / 16,
-        ]
-        self.weight = sum(
-            coefficients[i] * parameters[i] for i in range(len(coefficients))
+        self.weight = features.weigh(
+            self.weights,
+            self.get_holes(),
+            self.get_range(),
+            self.get_var_height(),
+            self.get_mean_height(),
+            self.get_bottom_holes(),
+            self.score,
         )
         return self.weight
 
@@ -139,66 +185,44 @@ class Candidate:
         """
         Calculate the range (max - min) of height from the board.
         """
-        peaks = []
-        for i in self.cells:
-            if self.cells[i]:
-                peaks.append(min(self.cells[i]))
-            else:
-                peaks.append(24)
-        self.range = max(peaks) - min(peaks)
+        self.range = features.height_range(self.board.heights)
         return self.range
 
     def update_cells(self):
         """
         Generate a dict for the cells according to column number.
-        Store this data since this is used in many functions so it is more efficient to store it rather than generating every time.
+        The features no longer need it since the board keeps track of the heights and holes itself.
         """
         self.cells = {i: [] for i in range(self.board.width)}
         for x, y in self.board.cells:
             self.cells[x].append(y)
         return self.cells
 
+    def peaks(self):
+        """
+        Return the y coordinate of the top of each column (the height of the board if empty).
+        """
+        return features.peaks(self.board.heights, self.board.height)
+
     def cal_var_height(self):
         """
         Calculate a equivalence (to avoid division which should be more expensive) of the variance of height.
         """
-        height = []
-        for i in self.cells:
-            if self.cells[i] == []:
-                height.append(24)
-                continue
-            height.append(min(self.cells[i]))
-
-        # modified equiation to save time on computation. divition is too expensive.
-        self.cal_var_height = (
-            sum(i**2 for i in height) * len(height) - (sum(height)) ** 2
-        )
-        return self.cal_var_height
+        self.var_height = features.var_height(self.peaks())
+        return self.var_height
 
     def cal_bottom_holes(self):
         """
         Calculate the number of holes at the bottom of the board.
         """
-        count = 0
-        for x, y in self.board.cells:
-            if y == 23:
-                count += 1
-        self.bottom_holes = self.board.width - count
-        return self.board.width - count
+        self.bottom_holes = self.board.width - self.board.fill[-1]
+        return self.bottom_holes
 
     def cal_mean_height(self):
         """
         Calculate the mean height of the board.
         """
-        cells = {i: [] for i in range(self.board.width)}
-
-        height = []
-        for i in self.cells:
-            if self.cells[i] != []:
-                height.append(min(self.cells[i]))
-            else:
-                height.append(24)
-        self.mean_height = 24 - sum(height) / len(height)
+        self.mean_height = features.mean_height(self.peaks(), self.board.height)
         return self.mean_height
 
     @property
@@ -207,26 +231,10 @@ class Candidate:
 
     def cal_holes(self):
         """
-        try to count the number of holes.
+        count the number of holes.
         """
-        number = 0
-        for column in self.cells:
-            if not self.cells[column]:
-                continue
-            temp_column = self.cells[column]
-            temp_column.sort()
-            temp_column = list(
-                temp_column[i] for i in range(len(temp_column) - 1, -1, -1)
-            )
-
-            if temp_column[0] < 23:
-                number += 23 - temp_column[0]
-
-            for cell in range(len(temp_column) - 1):
-                number += temp_column[cell] - temp_column[cell + 1] - 1
-
-        self.holes = number
-        return number
+        self.holes = sum(self.board.holes)
+        return self.holes
 
     def __call__(self):
         return (self.target, self.rotation_target)
@@ -293,14 +301,29 @@ class Candidate:
         if self.board.falling == None:
             return
 
+        profile = self.profile
+        if profile is not None:
+            profile.count("candidates")
+            start = profile.clock()
+
         initial_score = self.board.score
-        moved = self.move()
-        rotated = self.rotate()
-        landed = moved or rotated
-        if not landed:
-            self.board.move(Direction.Drop)
-        self.update_cells()
+        token = None
+        if self.placement is not None:
+            # the final position is already known, skip the simulation.
+            # the board is shared with other candidates so the move is undone at the end.
+            token = self.board.place(self.placement)
+        else:
+            moved = self.move()
+            rotated = self.rotate()
+            landed = moved or rotated
+            if not landed:
+                self.board.move(Direction.Drop)
         final_score = self.board.score
+        self.board_score = final_score
+
+        if profile is not None:
+            profile.time("move", start)
+            start = profile.clock()
 
         # update parameters
         self.holes = self.cal_holes()
@@ -310,39 +333,87 @@ class Candidate:
         self.range = self.cal_range()
         self.board.next == None
 
-        if self.board.falling and self.board.next == None and not nested:
-            # find out the best move for the next block
-            subsequent_actions = SelectedPlayer().choose_action(board=self.board)
-
-            # apply the best move for the next block
-            target = (
-                self.board.falling.left
-                + subsequent_actions.count(Direction.Right)
-                - subsequent_actions.count(Direction.Left)
-            )
-            rotation_target = max(
-                subsequent_actions.count(Rotation.Anticlockwise),
-                subsequent_actions.count(Rotation.Clockwise) * 3,
-            )
-            next_candidate = Candidate(
-                self.board.clone(),
-                target=target,
-                rotation=rotation_target,
-                weights=self.weights,
-            )
-            next_candidate.try_move(True)
-            self.next_range = next_candidate.range
-            self.next_holes = next_candidate.holes
-            self.next_var_height = next_candidate.var_height
-            self.next_bottom_holes = next_candidate.bottom_holes
-            self.next_mean_height = next_candidate.mean_height
+        if profile is not None:
+            profile.time("features", start)
 
-            # obtain the score after the placement of the next block.
-            final_score = next_candidate.score
+        if self.board.falling and self.board.next == None and not nested:
+            if profile is not None:
+                start = profile.clock()
+
+            # the same board may have been reached before.
+            key = None
+            result = None
+            if self.cache is not None:
+                key = self.cache.key(self.board)
+                result = self.cache.get(key)
+                if profile is not None:
+                    profile.count("cache_hits" if result else "cache_misses")
+
+            if result is None:
+                # find out the best move for the next block
+                search = self.search
+                if search is None:
+                    search = Search(weights=self.weights, profile=profile)
+                if profile is not None:
+                    profile.count("nested_searches")
+                result = search.best(self.board)
+                if key is not None:
+                    self.cache.put(key, result)
+
+            (
+                self.next_range,
+                self.next_holes,
+                self.next_var_height,
+                self.next_bottom_holes,
+                self.next_mean_height,
+                final_score,  # obtain the score after the placement of the next block.
+            ) = result
+
+            if profile is not None:
+                profile.time("nested", start)
 
         self.score = (final_score - initial_score) // 100
         self.weight = self.cal_weight()
 
+        if token is not None:
+            if profile is not None:
+                start = profile.clock()
+            self.board.undo(token)
+            if profile is not None:
+                profile.time("move", start)
+
+
+# the attributes of a Candidate that are computed by try_move.
+CANDIDATE_RESULTS = (
+    "bottom_holes",
+    "mean_height",
+    "var_height",
+    "holes",
+    "range",
+    "score",
+    "board_score",
+    "next_mean_height",
+    "next_var_height",
+    "next_holes",
+    "next_bottom_holes",
+    "next_range",
+    "weight",
+)
+
+
+def evaluate_placement(task):
+    """
+    Evaluate one placement of the falling block, including the search for the next block, in a worker process.
+    task is a tuple of the packed board (see Board.pack), the placement as (shape, rotation, x, y, score) and the weights.
+    Returns the values of CANDIDATE_RESULTS.
+    """
+    packed, (shape, rotation, x, y, score), weights = task
+    board = Board.unpack(packed)
+    placement = Placement(Shape(shape), rotation, x, y, [], score=score)
+    candidate = Candidate(board, placement=placement, weights=weights)
+    candidate.try_move()
+    return tuple(getattr(candidate, name) for name in CANDIDATE_RESULTS)
+
 
 class Player:
     """
@@ -355,9 +426,38 @@ class Player:
 
 
 class MyPlayer(Player):
-    def __init__(self):
+    def __init__(
+        self,
+        vectorised=False,
+        cache=None,
+        processes=None,
+        weights=DEFAULT_WEIGHTS,
+        profile=None,
+    ):
+        """
+        weights are the coefficients of the features (see Candidate.cal_weight).
+        profile is a Profile (see profiler.py) to record counters and timers of the search into, if any.
+        vectorised is True to evaluate all the placements at once with NumPy (see batch.py) instead of one Candidate at a time.
+        cache is a TranspositionTable (see cache.py) that keeps the results of the next block between candidates and calls.
+        processes is the number of worker processes that evaluate the placements in parallel, if any.
+        They are started on the first move and kept until close is called, or the end of a with block.
+        The player can not start them inside a daemonic process, such as a worker of trainer.run_batch.
+        The workers evaluate bare Candidates, so processes can not be combined with a cache or a profile.
+        The chosen actions are the same either way.
+        """
         self.candidates = []  # stores the candidates of possible moves.
-        self.weights = DEFAULT_WEIGHTS
+        self.best = None  # the candidate chosen by the last choose_action.
+        self.weights = weights
+        self.cache = cache
+        self.processes = processes
+        self.pool = None  # started on the first use and kept for the following calls.
+        self.profile = profile
+        self.search = Search(weights=weights, profile=profile)  # searches the next block for every candidate.
+        if vectorised and not batch.available():
+            raise ImportError("vectorised evaluation requires numpy.")
+        if processes and (cache is not None or profile is not None):
+            raise ValueError("the worker processes use neither a cache nor a profile.")
+        self.vectorised = vectorised
 
     def min_range(self, array=None):
         """
@@ -417,10 +517,10 @@ class MyPlayer(Player):
         result = []
 
         for i in array:
-            if i.board.score > best_score:
+            if i.board_score > best_score:
                 result = [i]
-                best_score = i.board.score
-            elif i.board.score == best_score:
+                best_score = i.board_score
+            elif i.board_score == best_score:
                 result.append(i)
 
         return result
@@ -518,53 +618,387 @@ class MyPlayer(Player):
         """
         Where all the 'magic' takes place.
         """
-        result = list()  # initialisation of the list of actions
-        self.candidates = list()  # make sure the list is empty for each new block.
-
         if not board.falling:
             # no blocks falling.
-            result.append(Direction.Drop)
+            return [Direction.Drop]
+
+        # the placement knows the series of actions need to be taken.
+        return list(self.choose_placement(board).actions)
+
+    def choose_placement(self, board):
+        """
+        Return the placement (see placement.py) of the falling block with the best weight.
+        The board is left as it was given.
+        """
+        self.candidates = list()  # make sure the list is empty for each new block.
+        profile = self.profile
+
+        if self.vectorised:
+            self.best = None
+            placement = self.batch_action(board)
+            if profile is not None:
+                profile.end_piece()
+            return placement
+        elif self.processes:
+            self.parallel_candidates(board)
         else:
-            # create clones for each positions that can be falled on.
-            for horizontal in range(board.width):
-                for orientation in range(4):
-                    new_board = board.clone()
-                    new_candidate = Candidate(
-                        new_board,
-                        target=horizontal,
-                        rotation=orientation,
-                        weights=self.weights,
-                    )
-                    self.candidates.append(new_candidate)
-                    new_candidate.try_move()
+            # create candidates for each distinct position the block can land on.
+            # they all explore the same board and undo their move afterwards.
+            if profile is not None:
+                start = profile.clock()
+            options = placements(board)
+            if profile is not None:
+                profile.time("placements", start)
+
+            for placement in options:
+                new_candidate = Candidate(
+                    board,
+                    placement=placement,
+                    weights=self.weights,
+                    cache=self.cache,
+                    profile=profile,
+                    search=self.search,
+                )
+                self.candidates.append(new_candidate)
+                new_candidate.try_move()
+
+        if profile is not None:
+            start = profile.clock()
+
+        # determin the best position for the board according to their weight.
+        best_candidates = self.min_mean_height(
+            self.min_holes(self.max_score(self.min_weight(self.candidates)))
+        )
+        best_candidate = best_candidates[0]
+        self.best = best_candidate
 
-            # determin the best position for the board according to their weight.
+        if profile is not None:
+            profile.time("select", start)
+            profile.end_piece()
+        return best_candidate.placement
 
-            best_candidates = self.min_mean_height(
-                self.min_holes(self.max_score(self.min_weight(self.candidates)))
+    def parallel_candidates(self, board):
+        """
+        Evaluate the candidates in the worker processes.
+        The candidates keep the order of placements() so that the choice is the same as evaluating them here.
+        """
+        if self.pool is None:
+            self.pool = mp.Pool(self.processes)
+
+        packed = board.pack()
+        options = placements(board)
+        tasks = [
+            (
+                packed,
+                (p.shape.value, p.rotation, p.x, p.y, p.score),
+                self.weights,
             )
-            best_candidate = best_candidates[0]
-
-            if (
-                best_candidate.target != board.falling.left
-            ) or best_candidate.rotation_target:
-                # generate the series of actions need to be taken.
-                if best_candidate.rotation_target <= 2:
-                    result += [Rotation.Anticlockwise] * best_candidate.rotation_target
-                else:
-                    result += [Rotation.Clockwise]
-
-                if best_candidate.target < board.falling.left:
-                    result += [Direction.Left] * (
-                        board.falling.left - best_candidate.target
-                    )
-                elif best_candidate.target > board.falling.left:
-                    result += [Direction.Right] * (
-                        best_candidate.target - board.falling.left
+            for p in options
+        ]
+        for placement, values in zip(options, self.pool.map(evaluate_placement, tasks)):
+            candidate = Candidate(board, placement=placement, weights=self.weights)
+            for name, value in zip(CANDIDATE_RESULTS, values):
+                setattr(candidate, name, value)
+            self.candidates.append(candidate)
+
+    def close(self):
+        """
+        Stop the worker processes, if any.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def batch_action(self, board):
+        """
+        Same as choose_placement, but every board after the falling block (and the next block, if known) lands is evaluated in one go.
+        """
+        first = placements(board)
+        initial_score = board.score
+
+        if board.next is None:
+            grids = batch.unpack(
+                [placement.overlay(board.rows) for placement in first], board.width
+            )
+            features = batch.features(grids)
+            drops = batch.np.array([placement.score for placement in first])
+            board_score = initial_score + drops + batch.line_score(features["lines"])
+            weight = batch.weigh(
+                features, (board_score - initial_score) // 100, self.weights
+            )
+            index = batch.best(
+                weight, board_score, features["holes"], features["mean_height"]
+            )
+            return first[index]
+
+        # place the falling block and list the placements of the next block for every one of them.
+        rows = []
+        drops = []
+        scores = []
+        groups = []
+        first_scores = []
+        for placement in first:
+            token = board.place(placement)
+            first_scores.append(board.score)
+            start = len(rows)
+            if board.falling:
+                for subsequent in placements(board):
+                    rows.append(subsequent.overlay(board.rows))
+                    drops.append(subsequent.score)
+                    scores.append(board.score)
+            groups.append((start, len(rows)))
+            board.undo(token)
+
+        np = batch.np
+        features = batch.features(batch.unpack(rows, board.width))
+        points = np.array(drops) + batch.line_score(features["lines"])
+        next_score = points // 100
+        board_score = np.array(scores) + points
+        weight = batch.weigh(features, next_score, self.weights)
+
+        # the best placement of the next block decides the features of every placement of the falling block.
+        chosen = []
+        for start, end in groups:
+            chosen.append(
+                start
+                + batch.best(
+                    weight[start:end],
+                    board_score[start:end],
+                    features["holes"][start:end],
+                    features["mean_height"][start:end],
+                )
+            )
+        chosen = np.array(chosen)
+        first_features = {name: value[chosen] for name, value in features.items()}
+        weight = batch.weigh(
+            first_features, (next_score[chosen] - initial_score) // 100, self.weights
+        )
+        index = batch.best(
+            weight,
+            first_scores,
+            first_features["holes"],
+            first_features["mean_height"],
+        )
+        return first[index]
+
+
+# a placement evaluated by BeamSearchPlayer as kept in its cache: the rotation, column, row and drop points of the placement, then the result of evaluate.
+# packed into bytes, the table can tell the size of an entry at once, and it is a tenth of that of the same tuples.
+EVALUATION = struct.Struct("<bbbiiiqdii")
+
+
+class Node:
+    """
+    A board in the search tree of BeamSearchPlayer.
+    """
+
+    def __init__(self, board, placement=None, parent=None, weight=0):
+        self.board = board
+        self.placement = placement  # the placement that lead from the parent to this board.
+        self.parent = parent
+        self.weight = weight  # the weight of the board itself, lower is better.
+        self.children = None  # a dict of shape to the list of children, once expanded.
+        self.pruned = False  # True if the node was left out of the beam of a deeper depth that completed.
+
+    def value(self):
+        """
+        Return the value of the node according to its subtree, so that only boards of the deepest completed depth are compared.
+        Known shapes take the best child, unknown shapes take the average of the best child of every shape.
+        Pruned nodes are worth nothing; shapes whose children were all pruned are left out of the average.
+        """
+        if self.pruned:
+            return float("inf")
+        if not self.children:
+            return self.weight
+
+        best = []
+        for children in self.children.values():
+            if not children:
+                # the game is over for this shape.
+                best.append(float("inf"))
+            elif not all(child.pruned for child in children):
+                best.append(min(child.value() for child in children))
+        if not best:
+            return float("inf")
+        return sum(best) / len(best)
+
+
+class BeamSearchPlayer(Player):
+    """
+    Searches depth blocks ahead, keeping only the width best boards at each depth.
+    The falling block, the next block and the shapes in upcoming (if any) are known; deeper blocks may be any shape.
+    The boards are evaluated with the same features and weights as Candidate.
+    The search deepens one depth at a time and decides on the deepest complete depth once the move runs out of time.
+    The time for each move is given by budget (a TimeBudget, see budget.py) if any, or time_limit seconds otherwise.
+    """
+
+    def __init__(
+        self,
+        depth=2,
+        width=8,
+        time_limit=1.0,
+        weights=DEFAULT_WEIGHTS,
+        budget=None,
+        cache=None,
+    ):
+        self.depth = depth
+        self.width = width
+        self.time_limit = time_limit
+        self.weights = weights
+        self.budget = budget
+        self.cache = cache  # a TranspositionTable (see cache.py) of the evaluated placements of a board and shape, if any.
+        self.upcoming = []  # shapes known to come after the next block.
+        self.reached = 0  # the depth completed by the last choose_action.
+
+    def evaluate(self, node, placement):
+        """
+        Return the holes, range, var_height, mean_height and bottom_holes of the board after the placement, and the points it scores.
+        None of them depend on the search, so they are kept in the cache for the next moves, which meet the same boards again.
+        """
+        candidate = Candidate(node.board, placement=placement, weights=self.weights)
+        candidate.try_move(True)
+        return (
+            candidate.holes,
+            candidate.range,
+            candidate.var_height,
+            candidate.mean_height,
+            candidate.bottom_holes,
+            candidate.board_score - node.board.score,
+        )
+
+    def expand(self, node, shapes, initial_score):
+        """
+        Create the children of the node for every possible shape of its falling block.
+        shapes is None for the root, whose falling block is already on the board.
+        """
+        node.children = {}
+        for shape in shapes or [None]:
+            if shape is not None:
+                falling = Block(shape)
+                falling.initialize(node.board)
+                node.board.falling = falling
+                node.board.next = None
+
+            if not node.board.alive:
+                # the game is over on this board.
+                node.children[shape] = []
+                continue
+
+            falling = node.board.falling.shape
+            key = None
+            cached = None
+            if self.cache is not None:
+                key = (node.board.key, falling)
+                cached = self.cache.get(key)
+            if cached is not None:
+                # the actions are left out; see choose_placement.
+                entries = EVALUATION.iter_unpack(cached)
+                evaluated = [
+                    (Placement(falling, rotation, x, y, None, points), result)
+                    for rotation, x, y, points, *result in entries
+                ]
+            else:
+                evaluated = [
+                    (placement, self.evaluate(node, placement))
+                    for placement in placements(node.board)
+                ]
+                if key is not None:
+                    cached = b"".join(
+                        EVALUATION.pack(p.rotation, p.x, p.y, p.score, *result)
+                        for p, result in evaluated
                     )
+                    self.cache.put(key, cached)
+
+            # the score counts every line cleared since the start of the search.
+            scored = node.board.score - initial_score
+            node.children[shape] = [
+                Node(
+                    None,
+                    placement=placement,
+                    parent=node,
+                    weight=features.weigh(
+                        self.weights, *result[:5], (scored + result[5]) // 100
+                    ),
+                )
+                for placement, result in evaluated
+            ]
 
-            result.append(Direction.Drop)
-        return result
+    def choose_action(self, board):
+        if not board.falling:
+            return [Direction.Drop]
+
+        return list(self.choose_placement(board).actions)
+
+    def choose_placement(self, board):
+        """
+        Return the placement (see placement.py) of the falling block leading to the best board.
+        """
+        if self.budget is not None:
+            clock = self.budget.clock
+            deadline = self.budget.deadline()
+        else:
+            clock = time.monotonic
+            deadline = clock() + self.time_limit
+
+        known = [board.next.shape] if board.next else []
+        known += self.upcoming
+
+        root = Node(board.clone())
+        layer = [root]
+        pruned = []
+        self.reached = 0
+        for depth in range(self.depth):
+            if depth == 0:
+                shapes = None
+            elif depth <= len(known):
+                shapes = [known[depth - 1]]
+            else:
+                shapes = list(Shape)
+
+            children = []
+            for node in layer:
+                if depth and clock() > deadline:
+                    break
+                self.expand(node, shapes, board.score)
+                for group in node.children.values():
+                    children += group
+            else:
+                self.reached = depth + 1
+
+            if self.reached <= depth:
+                # out of time; forget the incomplete depth and decide on the previous one.
+                for node in layer:
+                    node.children = None
+                for node in pruned:
+                    node.pruned = False
+                break
+
+            # only the best boards are searched any further.
+            children.sort(key=lambda child: child.weight)
+            layer = children[: self.width]
+            if depth + 1 == self.depth or clock() > deadline:
+                break
+
+            pruned = children[self.width :]
+            for node in pruned:
+                node.pruned = True
+
+            for child in layer:
+                child.board = child.parent.board.clone()
+                child.board.place(child.placement)
+
+        best = min(root.children[None], key=lambda child: child.value())
+        if best.placement.actions is None:
+            # the placement came from the cache.
+            return find(board, *best.placement())
+        return best.placement
 
 
 class RandomPlayer(Player):
@@ -0,0 +1,60 @@
+import json
+from time import perf_counter
+
+
+class Profile:
+    """
+    Collects counters and phase timers of a player, per piece and for the
+    whole game. Players only record into a profile if they are given one,
+    so profiling costs nothing when it is disabled.
+
+    The search for the next block is timed as a whole (the nested phase);
+    the positions it evaluates are counted with the candidates.
+    """
+
+    pieces = None
+    current = None
+
+    clock = staticmethod(perf_counter)
+
+    def __init__(self):
+        self.pieces = []
+        self.current = {"counters": {}, "timers": {}}
+
+    def count(self, name, amount=1):
+        counters = self.current["counters"]
+        counters[name] = counters.get(name, 0) + amount
+
+    def time(self, name, start):
+        """
+        Adds the time since start (a value of clock) to the given phase.
+        """
+
+        timers = self.current["timers"]
+        timers[name] = timers.get(name, 0) + self.clock() - start
+
+    def end_piece(self):
+        """
+        Closes the statistics of the current piece and starts a new one.
+        """
+
+        self.pieces.append(self.current)
+        self.current = {"counters": {}, "timers": {}}
+
+    def totals(self):
+        """
+        Returns the counters and timers summed over all pieces.
+        """
+
+        totals = {"counters": {}, "timers": {}}
+        for piece in self.pieces:
+            for kind in totals:
+                for name, value in piece[kind].items():
+                    totals[kind][name] = totals[kind].get(name, 0) + value
+        return totals
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            json.dump(
+                {"pieces": self.pieces, "totals": self.totals()}, file, indent=2
+            )
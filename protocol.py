@@ -0,0 +1,206 @@
+"""
+The compact binary mode of the wire protocol between client.py, which runs
+the game, and server.py, which runs the player.
+
+A player that knows the modes says so as soon as it starts, with a HELLO
+line that older games skip since it does not start with PREFIX. The game
+waits up to HELLO_TIMEOUT seconds for it before the first block; only then
+does it offer the mode with a text message, which the player either accepts
+or answers with the text mode. Without the HELLO, as from an older player
+that would take the offer for a shape, the game is played in the text mode.
+In the binary mode every shape is a single byte, and the player sends a
+single message per block: either the final column and rotation of the block
+in one byte, or a packed list of actions.
+
+The game may also offer a lookahead window of K blocks, in either mode. It
+then sends every shape K blocks before it is needed, so that the player can
+read the upcoming shapes and never waits for one, and marks the end of the
+shapes with END.
+"""
+
+import select
+import time
+
+from board import Direction, Rotation, Shape
+from constants import PREFIX
+from exceptions import UnknownInstructionException
+
+MODE = "MODE"
+TEXT = "TEXT"
+BINARY = "BINARY"
+
+HELLO = "<TETRIS WIRE MODES>"
+HELLO_TIMEOUT = 5  # seconds
+
+# Shapes are sent as their index; the end of the shapes and of the game
+# have their own bytes, named like the text messages.
+SHAPES = list(Shape)
+END = "END"
+WON = "WON"
+LOST = "LOST"
+MARKERS = {0xFD: END, 0xFE: WON, 0xFF: LOST}
+
+# Actions are sent as their index, None being a skip.
+ACTIONS = [
+    Direction.Left,
+    Direction.Right,
+    Direction.Down,
+    Direction.Drop,
+    Rotation.Clockwise,
+    Rotation.Anticlockwise,
+    None,
+]
+
+# The first byte of a message is either a placement, with this bit set,
+# or the number of actions that follow it.
+PLACEMENT = 0x80
+MAX_ACTIONS = PLACEMENT - 1
+
+
+def hello_message():
+    return f"{HELLO} {TEXT} {BINARY}"
+
+
+def wait_hello(stream, timeout=HELLO_TIMEOUT):
+    """
+    Waits up to timeout seconds for the HELLO of the player on a binary
+    stream, skipping any other output. Returns True if it came. The stream
+    must be selectable, as pipes and sockets are on POSIX.
+    """
+
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([stream], [], [], remaining)[0]:
+            return False
+
+        line = stream.readline()
+        if not line:
+            return False
+        if line.decode(errors="replace").startswith(HELLO):
+            return True
+
+
+def mode_message(mode, window=0):
+    if window:
+        return f"{PREFIX} {MODE} {mode} {window}"
+    return f"{PREFIX} {MODE} {mode}"
+
+
+def parse_mode(line):
+    """
+    Returns the mode and the lookahead window of a mode message, or None if
+    the line is not one.
+    """
+
+    words = line[len(PREFIX) :].split()
+    if not line.startswith(PREFIX) or words[:1] != [MODE]:
+        return None
+    if len(words) == 2:
+        return words[1], 0
+    if len(words) == 3 and words[2].isdigit():
+        return words[1], int(words[2])
+    raise UnknownInstructionException
+
+
+def parse_action(instruction):
+    """
+    Returns the action of a text message of the player (without the PREFIX),
+    None being a skip.
+    """
+
+    if instruction == "SKIP":
+        return None
+
+    try:
+        return Direction(instruction)
+    except ValueError:
+        pass
+
+    try:
+        return Rotation(instruction)
+    except ValueError:
+        pass
+
+    raise UnknownInstructionException
+
+
+def read_line(stream):
+    """
+    Reads the next line of the protocol (starting with PREFIX) from a binary
+    stream, skipping any other output. Returns None at the end of the stream.
+    """
+
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+
+        line = line.decode().strip()
+        if line.startswith(PREFIX):
+            return line
+
+
+def read_byte(stream):
+    data = stream.read(1)
+    if not data:
+        raise EOFError
+    return data[0]
+
+
+def encode_shape(shape):
+    return bytes([SHAPES.index(shape)])
+
+
+def encode_marker(marker):
+    return bytes([code for code, name in MARKERS.items() if name == marker])
+
+
+def decode_shape(byte):
+    """
+    Returns the shape of a byte, or its marker (END, WON or LOST).
+    """
+
+    if byte in MARKERS:
+        return MARKERS[byte]
+    try:
+        return SHAPES[byte]
+    except IndexError:
+        raise UnknownInstructionException
+
+
+def encode_placement(x, rotation):
+    return bytes([PLACEMENT | rotation << 4 | x])
+
+
+def encode_actions(actions):
+    """
+    Packs a list of actions into as many messages as needed.
+    """
+
+    codes = [ACTIONS.index(action) for action in actions]
+    data = bytearray()
+    for start in range(0, len(codes), MAX_ACTIONS):
+        chunk = codes[start : start + MAX_ACTIONS]
+        data.append(len(chunk))
+        data.extend(chunk)
+    return bytes(data)
+
+
+def read_move(stream):
+    """
+    Reads one message of the player from a binary stream. Returns either a
+    tuple of the column and the rotation of the block, or a list of actions.
+    """
+
+    header = read_byte(stream)
+    if header & PLACEMENT:
+        return (header & 0x0F, header >> 4 & 0x03)
+
+    codes = stream.read(header)
+    if len(codes) != header:
+        raise EOFError
+    try:
+        return [ACTIONS[code] for code in codes]
+    except IndexError:
+        raise UnknownInstructionException
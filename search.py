@@ -0,0 +1,79 @@
+"""
+A search for the best position of the falling block that does not look any
+further ahead, as used by Candidate.try_move for the next block. It gives
+the same result as evaluating a MyPlayer with its Candidates, but works on
+(rotation, column) positions instead of placements and their actions, and
+lands the blocks on scratch copies of the board that are kept between calls.
+"""
+
+import features
+from board import LINE_SCORES, add_cells, remove_full_lines, shape_to_orientations
+from constants import DEFAULT_WEIGHTS
+from placement import positions
+
+
+class Search:
+    def __init__(self, weights=DEFAULT_WEIGHTS, profile=None):
+        self.weights = weights
+        self.profile = profile  # a Profile to count the evaluated positions in, if any.
+
+        # scratch copies of the board, overwritten for every position.
+        self.rows = []
+        self.fill = []
+        self.heights = []
+        self.holes = []
+
+    def land(self, board, orientation, x, y):
+        """
+        Copy the board into the scratch buffers and land a block of the given orientation at (x, y) on them.
+        Returns the number of lines cleared.
+        """
+        rows = self.rows
+        fill = self.fill
+        heights = self.heights
+        holes = self.holes
+        rows[:] = board.rows
+        fill[:] = board.fill
+        heights[:] = board.heights
+        holes[:] = board.holes
+
+        add_cells(rows, fill, heights, holes, orientation.cells, x, y)
+        return len(remove_full_lines(rows, fill, heights, holes, board.width))
+
+    def best(self, board):
+        """
+        Find the best position of the falling block on the board, with the tie-breaks of MyPlayer.choose_placement.
+        Returns the range, holes, var_height, bottom_holes, mean_height and score of the board after it lands, see Candidate.
+        """
+        weights = self.weights
+        orientations = shape_to_orientations[board.falling.shape]
+        initial_score = board.score
+        heights = self.heights
+        profile = self.profile
+
+        best = None
+        best_key = None
+        for rotation, x, y, points, _ in positions(board):
+            if profile is not None:
+                profile.count("candidates")
+            lines = self.land(board, orientations[rotation], x, y)
+            board_score = initial_score + points + LINE_SCORES[lines]
+            score = (board_score - initial_score) // 100
+
+            # the same features as Candidate.try_move, bottom_holes included.
+            peaks = features.peaks(heights, board.height)
+            holes = sum(self.holes)
+            mean_height = features.mean_height(peaks, board.height)
+            var_height = features.var_height(peaks)
+            height_range = features.height_range(heights)
+            weight = features.weigh(
+                weights, holes, height_range, var_height, mean_height, holes, score
+            )
+
+            # min_weight, max_score, min_holes and min_mean_height in turn, the first one on a tie.
+            key = (weight, -board_score, holes, mean_height)
+            if best_key is None or key < best_key:
+                best_key = key
+                best = (height_range, holes, var_height, holes, mean_height, score)
+
+        return best
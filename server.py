@@ -1,26 +1,80 @@
+import sys
+from collections import deque
+from os import getenv
+
+import protocol
 from adversary import Adversary
 from board import Board, Direction, Rotation, Shape
 from constants import BOARD_HEIGHT, BOARD_WIDTH, PREFIX
 from exceptions import UnknownInstructionException
-from player import SelectedPlayer
+from placement import find
+from player import Player, SelectedPlayer
+
+
+class StreamAdversary(Adversary):
+    """
+    Reads the shapes sent by the game. With a lookahead window, the game
+    sends every shape window blocks ahead; they are read as soon as they are
+    known to be sent and given to the player as its upcoming shapes, if it
+    takes them.
+    """
+
+    def __init__(self, window=0, player=None):
+        self.window = window
+        self.player = player
+        self.queue = deque()
+        self.ended = False  # the game has sent all of its shapes.
 
+    def read_shape(self):
+        """
+        Returns the next shape, or a marker (see protocol.py).
+        """
+        raise NotImplementedError
 
-class RemoteAdversary(Adversary):
     def choose_block(self, board):
-        while True:
-            try:
-                command = input().strip()
-            except EOFError:
+        while not self.ended and len(self.queue) <= self.window:
+            shape = self.read_shape()
+            if shape == protocol.END:
+                self.ended = True
+            elif shape == protocol.WON or shape == protocol.LOST:
+                # Game ended; stop cleanly.
                 raise SystemExit
+            else:
+                self.queue.append(shape)
+
+        if not self.queue:
+            raise SystemExit
 
-            if command.startswith(PREFIX):
-                break
+        shape = self.queue.popleft()
+        if hasattr(self.player, "upcoming"):
+            self.player.upcoming = list(self.queue)
+        return shape
+
+
+class RemoteAdversary(StreamAdversary):
+    def __init__(self, pending=None, window=0, player=None):
+        super().__init__(window, player)
+        # A line that was read before the game started, if any.
+        self.pending = pending
+
+    def read_shape(self):
+        if self.pending is not None:
+            command = self.pending
+            self.pending = None
+        else:
+            while True:
+                try:
+                    command = input().strip()
+                except EOFError:
+                    raise SystemExit
+
+                if command.startswith(PREFIX):
+                    break
 
         command = command[len(PREFIX) + 1 :]
 
-        if command == "WON" or command == "LOST":
-            # Game ended; stop cleanly.
-            raise SystemExit
+        if command in (protocol.END, protocol.WON, protocol.LOST):
+            return command
 
         try:
             return Shape(command)
@@ -30,15 +84,91 @@ class RemoteAdversary(Adversary):
         raise UnknownInstructionException
 
 
+class BinaryAdversary(StreamAdversary):
+    """
+    Reads the shapes in the binary mode of the protocol (see protocol.py).
+    """
+
+    def __init__(self, stream, window=0, player=None):
+        super().__init__(window, player)
+        self.stream = stream
+
+    def read_shape(self):
+        try:
+            return protocol.decode_shape(protocol.read_byte(self.stream))
+        except EOFError:
+            raise SystemExit
+
+
+class BinaryPlayer(Player):
+    """
+    Sends the moves of a player in the binary mode of the protocol, as a
+    single placement if the player chooses whole placements and as a list of
+    actions otherwise.
+    """
+
+    def __init__(self, player, stream):
+        self.player = player
+        self.stream = stream
+
+    def choose_action(self, board):
+        if hasattr(self.player, "choose_placement"):
+            placement = self.player.choose_placement(board)
+            if isinstance(placement, tuple):
+                placement = find(board, *placement)
+            self.stream.write(protocol.encode_placement(*placement()))
+            actions = placement.actions
+        else:
+            actions = self.player.choose_action(board)
+            try:
+                actions = list(actions)
+            except TypeError:
+                actions = [actions]
+            self.stream.write(protocol.encode_actions(actions))
+
+        self.stream.flush()
+        return actions
+
+
+# Tell the game that the modes below are known, before it sends anything.
+print(protocol.hello_message(), flush=True)
+
 board = Board(BOARD_WIDTH, BOARD_HEIGHT)
 
 player = SelectedPlayer()
-adversary = RemoteAdversary()
-
-for move in board.run(player, adversary):
-    if isinstance(move, Direction):
-        print(f"{PREFIX} {move.value}")
-    elif isinstance(move, Rotation):
-        print(f"{PREFIX} {move.value}")
-    elif move is None:
-        print(f"{PREFIX} SKIP")
+
+# The game may offer the binary mode and a lookahead window before the first
+# block. Accept the binary mode unless PROTOCOL=TEXT is set, and a window of
+# up to LOOKAHEAD blocks if that is set.
+line = protocol.read_line(sys.stdin.buffer)
+if line is None:
+    raise SystemExit
+
+mode = protocol.TEXT
+window = 0
+pending = line
+offer = protocol.parse_mode(line)
+if offer is not None:
+    pending = None
+    offered, window = offer
+    if offered == protocol.BINARY:
+        mode = getenv("PROTOCOL", protocol.BINARY).upper()
+    if mode != protocol.BINARY:
+        mode = protocol.TEXT
+    if getenv("LOOKAHEAD"):
+        window = min(window, int(getenv("LOOKAHEAD")))
+    print(protocol.mode_message(mode, window), flush=True)
+
+if mode == protocol.BINARY:
+    adversary = BinaryAdversary(sys.stdin.buffer, window, player)
+    for move in board.run(BinaryPlayer(player, sys.stdout.buffer), adversary):
+        pass
+else:
+    adversary = RemoteAdversary(pending, window, player)
+    for move in board.run(player, adversary):
+        if isinstance(move, Direction):
+            print(f"{PREFIX} {move.value}")
+        elif isinstance(move, Rotation):
+            print(f"{PREFIX} {move.value}")
+        elif move is None:
+            print(f"{PREFIX} SKIP")
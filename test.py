@@ -2,6 +2,7 @@ from adversary import RandomAdversary
 from arguments import parser
 from board import Board, Direction, Rotation
 from constants import BOARD_WIDTH, BOARD_HEIGHT, DEFAULT_SEED, INTERVAL
+from gamelog import GameLog
 from player import SelectedPlayer, Player
 from time import sleep
 
@@ -141,17 +142,22 @@ def run(window):
         window.timeout(0)
         player = SelectedPlayer()
 
-    for move in board.run(player, adversary):
-        render(window, board)
-
-        if not args.manual:
-            while True:
-                key = window.getch()
-                if key == -1:
-                    break
-                elif key == curses.ascii.ESC:
-                    raise SystemExit
-            sleep(0.1)
+    log = GameLog(args.log, BOARD_WIDTH, BOARD_HEIGHT) if args.log else None
+    try:
+        for move in board.run(player, adversary, log):
+            render(window, board)
+
+            if not args.manual:
+                while True:
+                    key = window.getch()
+                    if key == -1:
+                        break
+                    elif key == curses.ascii.ESC:
+                        raise SystemExit
+                sleep(0.1)
+    finally:
+        if log is not None:
+            log.close()
 
     #    window.timeout(-1)
     window.getch()
@@ -0,0 +1,142 @@
+"""
+Regression tests of the board: the row masks, the column heights, holes and
+row fill counts it keeps up to date, the removal of full lines, and placing
+blocks straight at their placements and undoing that.
+
+Run with pytest.
+"""
+
+from random import Random
+
+from adversary import SHAPES
+from board import LINE_SCORES, Block, Board
+from constants import BOARD_HEIGHT, BOARD_WIDTH
+from placement import placements
+
+SEEDS = range(40)
+
+
+def random_board(seed):
+    """
+    Returns a board with up to 12 rough bottom rows, most of them one or two
+    cells short of full, and a falling and a next block.
+    """
+
+    random = Random(seed)
+    board = Board(BOARD_WIDTH, BOARD_HEIGHT, threadsafe=False)
+    for y in range(board.height - random.randint(0, 12), board.height):
+        gaps = random.sample(range(board.width), random.choice([1, 1, 2, 4]))
+        board.rows[y] = board.full & ~sum(1 << x for x in gaps)
+    board.measure()
+
+    board.falling = Block(random.choice(SHAPES))
+    board.falling.initialize(board)
+    board.next = Block(random.choice(SHAPES))
+    return board
+
+
+def state(board):
+    """
+    Returns everything place and undo change on a board.
+    """
+
+    blocks = [
+        block and (block.shape, block.rotation, block.x, block.y, block.center)
+        for block in (board.falling, board.next)
+    ]
+    return (
+        list(board.rows),
+        list(board.heights),
+        list(board.holes),
+        list(board.fill),
+        board.score,
+        board.lines,
+        board.pieces,
+        dict(board.cellcolor),
+        blocks,
+    )
+
+
+def test_placement_actions_reach_the_placement():
+    for seed in SEEDS:
+        board = random_board(seed)
+        for placement in placements(board):
+            played = board.clone()
+            landed = False
+            for action in placement.actions:
+                landed = played.apply(action)
+                if landed:
+                    break
+            assert landed
+
+            placed = board.clone()
+            placed.place(placement)
+
+            # Only the landed block has a colour, so the colours give its cells.
+            assert played.cellcolor == placed.cellcolor
+            assert played.rows == placed.rows
+            lines = LINE_SCORES[placed.lines - board.lines]
+            assert played.score == placed.score
+            assert placed.score == board.score + placement.score + lines
+            if played.lines == board.lines:
+                assert set(played.cellcolor) == placement.cells
+
+
+def test_place_undo_round_trip():
+    for seed in SEEDS:
+        random = Random(seed)
+        board = random_board(seed)
+        before = state(board)
+        for placement in placements(board):
+            token = board.place(placement)
+
+            # Undo a second placement on top of the first one as well.
+            board.next = Block(random.choice(SHAPES))
+            after = state(board)
+            options = placements(board) if board.alive else []
+            if options:
+                board.undo(board.place(random.choice(options)))
+                assert state(board) == after
+
+            board.undo(token)
+            assert state(board) == before
+
+
+def test_incremental_features_match_measure():
+    cleared = 0
+    for seed in SEEDS:
+        random = Random(seed)
+        board = random_board(seed)
+        for _ in range(30):
+            options = placements(board)
+            if not board.alive or not options:
+                break
+
+            lines = board.lines
+            board.place(random.choice(options))
+            cleared += board.lines - lines
+
+            expected = board.clone()
+            expected.measure()
+            assert board.heights == expected.heights
+            assert board.holes == expected.holes
+            assert board.fill == expected.fill
+
+            board.next = Block(random.choice(SHAPES))
+
+    # The boards are meant to clear lines; make sure they did.
+    assert cleared > 0
+
+
+def test_full_top_row_is_cleared():
+    board = Board(BOARD_WIDTH, BOARD_HEIGHT, threadsafe=False)
+    board.rows[0] = board.full
+    board.rows[-1] = 0b1
+    board.measure()
+
+    assert board.clean() == 100
+    assert board.lines == 1
+    assert board.rows[0] == 0
+    assert board.rows[-1] == 0b1
+    assert board.heights == [1] + [0] * (board.width - 1)
+    assert board.fill[0] == 0
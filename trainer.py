@@ -1,24 +1,337 @@
-from board import Board, Direction, Rotation
-from constants import BOARD_WIDTH, BOARD_HEIGHT, INTERVAL
-from player import Player, SelectedPlayer, RandomPlayer, MyPlayer
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from random import Random
+from statistics import mean, median, pstdev
+
+from board import Board
+from constants import (
+    BOARD_WIDTH,
+    BOARD_HEIGHT,
+    BLOCK_LIMIT,
+    DEFAULT_SEED,
+    DEFAULT_WEIGHTS,
+)
+from exceptions import BlockLimitException
+from player import MyPlayer
 from adversary import RandomAdversary
+from corpus import open_corpus
+from gamelog import GameLog
+
+
+def adversary_for(seed, blocks=None, corpus=None):
+    """
+    Returns the adversary of a seed, replaying its sequence from the corpus
+    file at the given path (see corpus.py) if any.
+    """
+
+    if corpus is not None:
+        return open_corpus(corpus).adversary(seed, blocks)
+    return RandomAdversary(seed, blocks)
 
 
-def run(seed, player):
+def run(seed, player, profile=None, corpus=None, log=None):
+    """
+    Plays one game and returns the score. If profile is a path and the player
+    has a Profile (see profiler.py), the profile of the game is written there.
+    If log is a path, the game is logged there (see gamelog.py).
+    """
+
     board = Board(BOARD_WIDTH, BOARD_HEIGHT)
-    adversary = RandomAdversary(seed=seed)
+    adversary = adversary_for(seed, corpus=corpus)
 
-    for move in board.run(player=player, adversary=adversary):
-        pass
+    game_log = GameLog(log, BOARD_WIDTH, BOARD_HEIGHT) if log else None
+    try:
+        for move in board.run(player=player, adversary=adversary, log=game_log):
+            pass
+    finally:
+        if game_log is not None:
+            game_log.close()
+        if hasattr(player, "close"):
+            player.close()
+
+    if profile is not None and getattr(player, "profile", None) is not None:
+        player.profile.dump(profile)
 
     return board.score
 
 
+def load_seeds(path="good_seed.txt"):
+    """
+    Returns DEFAULT_SEED followed by the seeds listed in the given file.
+    """
+
+    seeds = [DEFAULT_SEED]
+    with open(path) as file:
+        seeds += [int(line) for line in file if line.strip()]
+    return seeds
+
+
+def play_actions(board, player, adversary):
+    """
+    Runs the game like Board.run does, for players that only implement
+    choose_action, without yielding after every move.
+    """
+
+    board.run_adversary(adversary)
+    board.place_next_block()
+
+    while True:
+        board.run_adversary(adversary)
+        if not board.alive:
+            return
+
+        landed = False
+        while not landed:
+            actions = player.choose_action(board.clone())
+            try:
+                actions = iter(actions)
+            except TypeError:
+                actions = [actions]
+
+            for action in actions:
+                landed = board.apply(action)
+                if landed:
+                    break
+
+
+def play(seed, player, blocks=BLOCK_LIMIT, corpus=None):
+    """
+    Plays one game without rendering, stopping after the given number of
+    blocks like the grader does. Returns the score, the number of lines
+    cleared, the number of pieces placed and the wall time taken.
+    """
+
+    board = Board(BOARD_WIDTH, BOARD_HEIGHT, threadsafe=False)
+    adversary = adversary_for(seed, blocks, corpus)
+
+    start = time.perf_counter()
+    try:
+        if hasattr(player, "choose_placement"):
+            board.play_fast(player, adversary)
+        else:
+            play_actions(board, player, adversary)
+    except BlockLimitException:
+        pass
+    finally:
+        # stop the worker processes of the player, if any.
+        if hasattr(player, "close"):
+            player.close()
+
+    return {
+        "seed": seed,
+        "score": board.score,
+        "lines": board.lines,
+        "pieces": board.pieces,
+        "time": time.perf_counter() - start,
+    }
+
+
+def play_config(task):
+    """
+    Plays one game of a batch in a worker process. task is a tuple of the
+    seed, the name of the configuration, the player class and its keyword
+    arguments, the number of blocks and the path of the corpus, if any.
+    """
+
+    seed, name, player_class, kwargs, blocks, corpus = task
+    result = play(seed, player_class(**kwargs), blocks, corpus)
+    result["config"] = name
+    return result
+
+
+def run_batch(seeds, configs, processes=None, blocks=BLOCK_LIMIT, corpus=None):
+    """
+    Plays every seed with every player configuration, in parallel over a pool
+    of processes (all cores by default, none if processes is 1). configs maps
+    names to (player class, keyword arguments). The sequences are replayed
+    from the corpus file at the given path, if any, which every process maps
+    once. Returns the results in the order of configs, then seeds.
+
+    The worker processes can not start processes of their own, so players
+    given processes (see MyPlayer) are only allowed if processes is 1.
+    """
+
+    if processes != 1:
+        for name, (_, kwargs) in configs.items():
+            if kwargs.get("processes"):
+                raise ValueError(
+                    f"{name} starts worker processes, which the processes "
+                    "of a batch can not; run the batch with processes=1"
+                )
+
+    tasks = [
+        (seed, name, player_class, kwargs, blocks, corpus)
+        for name, (player_class, kwargs) in configs.items()
+        for seed in seeds
+    ]
+
+    if processes == 1:
+        return [play_config(task) for task in tasks]
+
+    with mp.Pool(processes) as pool:
+        return pool.map(play_config, tasks)
+
+
+def report(results):
+    """
+    Summarises the results of a batch per configuration. The score of a
+    configuration is the median over its games, like the grader computes it.
+    """
+
+    summary = {}
+    for result in results:
+        summary.setdefault(result["config"], []).append(result)
+
+    return {
+        name: {
+            "median": median(game["score"] for game in games),
+            "scores": [game["score"] for game in games],
+            "lines": sum(game["lines"] for game in games),
+            "pieces": sum(game["pieces"] for game in games),
+            "time": sum(game["time"] for game in games),
+        }
+        for name, games in summary.items()
+    }
+
+
+def optimise(
+    seeds,
+    generations=50,
+    population=16,
+    elite=4,
+    processes=None,
+    blocks=BLOCK_LIMIT,
+    checkpoint="optimiser.json",
+    output="weights.json",
+    seed=0,
+    corpus=None,
+):
+    """
+    Searches the coefficients of Candidate.cal_weight with the cross-entropy
+    method: every generation samples a population of weight vectors around
+    the current mean, plays all of them on every seed in parallel and moves
+    the mean and spread to those of the elite (highest median score).
+
+    The state is saved to checkpoint after every generation and picked up
+    again if the file exists, and the best weights so far, starting with
+    DEFAULT_WEIGHTS, are written to output. Returns the best weights and
+    their median score.
+    """
+
+    if os.path.exists(checkpoint):
+        with open(checkpoint) as file:
+            state = json.load(file)
+    else:
+        state = {
+            "generation": 0,
+            "mean": list(DEFAULT_WEIGHTS),
+            "std": [abs(weight) * 0.3 + 1 for weight in DEFAULT_WEIGHTS],
+            "best": list(DEFAULT_WEIGHTS),
+            "best_score": None,
+            "history": [],
+        }
+
+    if state["best_score"] is None:
+        # Score the starting weights, so that only better ones replace them.
+        configs = {"start": (MyPlayer, {"weights": state["best"]})}
+        summary = report(run_batch(seeds, configs, processes, blocks, corpus))
+        state["best_score"] = summary["start"]["median"]
+
+    while state["generation"] < generations:
+        # Sample from a generator seeded per generation, so that a resumed
+        # run samples the same vectors.
+        random = Random(f"{seed}-{state['generation']}")
+        candidates = [
+            [random.gauss(m, s) for m, s in zip(state["mean"], state["std"])]
+            for _ in range(population)
+        ]
+
+        configs = {
+            str(index): (MyPlayer, {"weights": weights})
+            for index, weights in enumerate(candidates)
+        }
+        summary = report(run_batch(seeds, configs, processes, blocks, corpus))
+        scores = [summary[str(index)]["median"] for index in range(population)]
+
+        ranked = sorted(range(population), key=lambda index: -scores[index])
+        elites = [candidates[index] for index in ranked[:elite]]
+        state["mean"] = [mean(column) for column in zip(*elites)]
+        # Keep some spread so the search does not collapse too early.
+        state["std"] = [
+            pstdev(column) + 0.01 * abs(m) + 0.1
+            for column, m in zip(zip(*elites), state["mean"])
+        ]
+
+        if scores[ranked[0]] > state["best_score"]:
+            state["best"] = candidates[ranked[0]]
+            state["best_score"] = scores[ranked[0]]
+
+        state["history"].append(
+            {
+                "generation": state["generation"],
+                "best": scores[ranked[0]],
+                "median": median(scores),
+            }
+        )
+        state["generation"] += 1
+
+        with open(checkpoint, "w") as file:
+            json.dump(state, file, indent=2)
+        with open(output, "w") as file:
+            json.dump({"weights": state["best"], "score": state["best_score"]}, file)
+
+        print(
+            f"generation {state['generation']}: best {scores[ranked[0]]}, "
+            f"overall {state['best_score']}"
+        )
+
+    return state["best"], state["best_score"]
+
+
 if __name__ == "__main__":
-    index = 0
-    signed = []
-    weights = []
-    for i in range(5):
-        player = MyPlayer()
+    parser = argparse.ArgumentParser(description="Play headless Tetris games")
+    parser.add_argument("seeds", nargs="*", type=int, help="Seeds to play")
+    parser.add_argument("--processes", "-p", type=int, help="Number of processes")
+    parser.add_argument("--blocks", "-b", type=int, default=BLOCK_LIMIT)
+    parser.add_argument(
+        "--optimise",
+        "-o",
+        type=int,
+        metavar="GENERATIONS",
+        help="Optimise the weights for this many generations",
+    )
+    parser.add_argument("--population", type=int, default=16)
+    parser.add_argument("--checkpoint", default="optimiser.json")
+    parser.add_argument("--output", default="weights.json")
+    parser.add_argument("--corpus", help="Replay the sequences from a corpus file")
+    args = parser.parse_args()
+
+    seeds = args.seeds or load_seeds()
+    if args.optimise:
+        optimise(
+            seeds,
+            generations=args.optimise,
+            population=args.population,
+            elite=max(args.population // 4, 1),
+            processes=args.processes,
+            blocks=args.blocks,
+            checkpoint=args.checkpoint,
+            output=args.output,
+            corpus=args.corpus,
+        )
+        raise SystemExit
+
+    configs = {"MyPlayer": (MyPlayer, {})}
+    results = run_batch(seeds, configs, args.processes, args.blocks, args.corpus)
 
-        print(run(42, RandomPlayer()))
+    for result in results:
+        print(
+            f"{result['config']} seed {result['seed']}: {result['score']} "
+            f"({result['lines']} lines, {result['pieces']} pieces, "
+            f"{result['time']:.1f}s)"
+        )
+    for name, summary in report(results).items():
+        print(f"{name}: median {summary['median']}")
@@ -2,6 +2,7 @@ from adversary import RandomAdversary
 from arguments import parser
 from board import Board, Direction, Rotation
 from constants import BOARD_WIDTH, BOARD_HEIGHT, DEFAULT_SEED, INTERVAL
+from gamelog import GameLog
 from player import Player, SelectedPlayer
 
 import pygame
@@ -122,15 +123,20 @@ def run():
     # Set timer to force block down when no input is given.
     pygame.time.set_timer(EVENT_FORCE_DOWN, INTERVAL)
 
-    for move in board.run(player, adversary):
-        render(screen, board)
-        pygame.display.flip()
+    log = GameLog(args.log, BOARD_WIDTH, BOARD_HEIGHT) if args.log else None
+    try:
+        for move in board.run(player, adversary, log):
+            render(screen, board)
+            pygame.display.flip()
 
-        # If we are not playing manually, clear the events.
-        if not args.manual:
-            check_stop()
+            # If we are not playing manually, clear the events.
+            if not args.manual:
+                check_stop()
 
-        clock.tick(FRAMES_PER_SECOND)
+            clock.tick(FRAMES_PER_SECOND)
+    finally:
+        if log is not None:
+            log.close()
     return board.score
 
 
@@ -6,6 +6,7 @@ from adversary import RandomAdversary
 from arguments import parser
 from board import Board, Direction, Rotation
 from constants import BOARD_HEIGHT, BOARD_WIDTH, DEFAULT_SEED, INTERVAL
+from gamelog import GameLog
 from player import SelectedPlayer, Player
 
 DRAW_INTERVAL = 100
@@ -149,11 +150,19 @@ def run():
     adversary = RandomAdversary(DEFAULT_SEED)
     board = Board(BOARD_WIDTH, BOARD_HEIGHT)
 
+    log = GameLog(args.log, BOARD_WIDTH, BOARD_HEIGHT) if args.log else None
+
     def runner():
-        for move in board.run(player, adversary):
-            # When not playing manually, allow some time to see the move.
-            if not args.manual:
-                sleep(0.1)
+        try:
+            for move in board.run(player, adversary, log):
+                # When not playing manually, allow some time to see the move.
+                if not args.manual:
+                    sleep(0.1)
+        finally:
+            # The log is flushed after every piece, so closing the window
+            # before the game ends loses nothing.
+            if log is not None:
+                log.close()
 
     Visual(board)
 